@@ -1,5 +1,4 @@
 import os
-import numpy as np
 import utils
 import rules
 
@@ -48,17 +47,18 @@ class PowerShellAnalyser:
         self.__pairs = pairs
         self.__identifier_length = identifier_length
 
-        self.__ids = []
-        self.__consts = []
+        # Interned ids and constants: value -> code
+        self.__ids = {}
+        self.__consts = {}
         self.__rules = []
 
         self.__init_rules()
 
     def __add_id(self, id: str):
-        self.__ids.append(id)
+        self.__ids.setdefault(id, len(self.__ids))
 
     def __add_const(self, const):
-        self.__consts.append(int(const))
+        self.__consts.setdefault(int(const), len(self.__consts))
 
     def __init_rules(self):
         # CHECK FOR ID
@@ -120,8 +120,8 @@ class PowerShellAnalyser:
             statement_ending_r]
 
     def analyze(self, source_code) -> [utils.Atom]:
-        self.__ids = []
-        self.__consts = []
+        self.__ids = {}
+        self.__consts = {}
 
         psp = self.PowerShellPreprocessor(self.__pairs)
         psp.process(source_code)
@@ -169,4 +169,4 @@ class PowerShellAnalyser:
 
                     atoms.append(utils.Atom(key, self.__atoms[val]))
 
-        return atoms, np.unique(np.array(self.__ids[:])).tolist(), np.unique(np.array(self.__consts[:])).tolist()
+        return atoms, sorted(self.__ids), sorted(self.__consts)
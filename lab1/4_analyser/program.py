@@ -1,6 +1,5 @@
 import os
 import json
-import avl
 import rules
 import analyser
 
@@ -48,21 +47,15 @@ if __name__ == "__main__":
             source_code = load_source_code(file_input_path)
             atoms, ids, consts = lexer.analyze(source_code)
 
-            ids_consts_tree = avl.AVLTree()
-            for id in ids:
-                ids_consts_tree.insert(id)
-
-            for const in consts:
-                ids_consts_tree.insert(str(const))
+            ids_consts = sorted(ids + [str(const) for const in consts])
 
             file_output_path = os.path.join(output_path, file)
             with open(file_output_path, 'w') as fout:
                 print("=== IDS & CONSTS ===")
                 fout.write("=== IDS & CONSTS ===" + os.linesep)
 
-                ids_consts_tree_in = ids_consts_tree.inorder()
-                print(ids_consts_tree_in)
-                fout.write(str(ids_consts_tree_in))
+                print(ids_consts)
+                fout.write(str(ids_consts))
                 fout.write(os.linesep)
 
                 print("=== ATOMS ===")
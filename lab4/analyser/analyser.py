@@ -1,13 +1,16 @@
 from fa.finite_automaton import FiniteAutomaton
+from fa.token_automaton import TokenAutomaton
 from analyser.errors import UnexpectedTokenError
-import numpy as np
+from analyser.symbol_table import SymbolTable
 
 
 class Atom:
-    def __init__(self, token, key, value):
+    def __init__(self, token, key, value, code=None):
         self.token = token
         self.key = key
         self.value = value
+        # Position in the symbol table for ids and constants
+        self.code = code
 
     def __repr__(self):
         return f"{str(self.value).rjust(2)} : {self.key}"
@@ -24,96 +27,229 @@ class Analyser:
 
         Args:
             atoms (dict<str, str>): Key = lexical atom, value = id
-            fas (list<FiniteAutomaton>): list of defined finite automatons
+            fas (list<FiniteAutomaton>): list of defined finite automatons, the first one has the highest priority
         """
         self.__atoms = atoms
         self.__fas = fas
+        self.__token_automaton = TokenAutomaton(fas)
+        self.__refresh()
+
+    @property
+    def ids(self) -> SymbolTable:
+        return self.__symbol_tables["ID"]
+
+    @property
+    def constants(self) -> SymbolTable:
+        return self.__symbol_tables["CONST"]
+
+    @property
+    def string_constants(self) -> SymbolTable:
+        return self.__symbol_tables["STRING_CONST"]
+
+    @property
+    def found_atoms(self) -> list:
+        """
+            The atoms of the analyzed source code, without ids and constants. After an edit the list is built again
+            from the atoms of every line the first time it is read.
+        """
+        if self.__found_atoms is None:
+            self.__found_atoms = []
+            for line_atoms in self.__line_atoms:
+                for atom in line_atoms:
+                    self.__add_token(atom)
+
+        return self.__found_atoms
 
     def __refresh(self):
         self.__found_atoms = []
-        self.__found_ids = []
-        self.__found_constants = []
-        self.__found_string_constants = []
+        # The atoms of every line of the analyzed source code, including ids and constants
+        self.__line_atoms = []
+        self.__symbol_tables = self.create_symbol_tables()
+
+    @staticmethod
+    def create_symbol_tables() -> dict:
+        """
+            Create an empty symbol table for every atom which is interned (ids and constants).
+
+        Returns:
+            dict<str, SymbolTable>: Key = atom, value = symbol table
+        """
+        return {
+            "ID": SymbolTable(),
+            "CONST": SymbolTable(),
+            "STRING_CONST": SymbolTable()
+        }
 
     def __add_token(self, atom: Atom):
-        if atom.key == "ID":
-            self.__found_ids.append(atom)
-        elif atom.key == "CONST":
-            self.__found_constants.append(atom)
-        elif atom.key == "STRING_CONST":
-            self.__found_string_constants.append(atom)
-        else:
+        # Ids and constants are interned in the symbol tables when found
+        if atom.key not in self.__symbol_tables:
             self.__found_atoms.append(atom)
 
+    def __discard_atoms(self, atoms: list):
+        for atom in atoms:
+            if atom.key in self.__symbol_tables:
+                self.__symbol_tables[atom.key].discard(atom.token)
+
+    def __tokenize_lines(self, lines: list, first_line_index: int) -> list:
+        """
+            Lexes lines into a list of atoms per line. If a line can't be lexed, the references added to the symbol
+            tables by the lines before it are dropped, so the symbol tables are left as they were.
+
+        Raises:
+            UnexpectedTokenError: if a line contains a token that is not part of the MLP
+
+        Returns:
+            list<list<Atom>>: the atoms of every line
+        """
+        line_atoms = []
+        try:
+            for line_index, line in enumerate(lines, first_line_index):
+                atoms = []
+                line_atoms.append(atoms)
+                for atom in self.tokenize_line(line, line_index, self.__symbol_tables):
+                    atoms.append(atom)
+        except UnexpectedTokenError:
+            for atoms in line_atoms:
+                self.__discard_atoms(atoms)
+
+            raise
+
+        return line_atoms
+
+    def tokenize_line(self, line: str, line_index: int = 0, symbol_tables: dict = None):
+        """
+            Generator that yields the atoms of a single line of source code.
+
+        Args:
+            line (str): the line of source code
+            line_index (int, optional): the index of the line, used for errors. Defaults to 0.
+            symbol_tables (dict<str, SymbolTable>, optional): the symbol tables where ids and constants are interned.
+            Defaults to None, the atoms of ids and constants don't receive a code.
+
+        Raises:
+            UnexpectedTokenError: if the line contains a token that is not part of the MLP
+
+        Yields:
+            Atom: the atoms of the line, in order
+        """
+        line = line.strip().rstrip()
+        if not line:
+            return
+
+        prev = 0
+        curr = 0
+        check_fas = True
+        while curr < len(line):
+            curr += 1
+            atom = None
+            line_part = line[prev:curr]
+            if check_fas:
+                fa, prefix = self.__token_automaton.get_longest_token(
+                    line[prev:])
+                if prefix:
+                    # ID OR CONST
+                    if fa.atom in self.__atoms:
+                        atom = Atom(prefix, fa.atom,
+                                    self.__atoms[fa.atom])
+                        if symbol_tables is not None and fa.atom in symbol_tables:
+                            atom.code = symbol_tables[fa.atom].add(prefix)
+                    # OPERATOR
+                    else:
+                        atom = Atom(fa.atom, prefix,
+                                    self.__atoms[prefix])
+
+                    prev += len(prefix)
+                    curr = prev
+
+                # Stop checking the Finite Automatons because there are unexpected characters at the beginning.
+                check_fas = bool(prefix)
+
+            # If check_fas is True, it means we found an accepted sequence by one of the fas.
+            if line_part in self.__atoms and not check_fas:
+                atom = Atom(line_part, line_part, self.__atoms[line_part])
+                prev = curr
+                check_fas = True
+
+            if atom:
+                yield atom
+
+        if prev != curr:
+            raise UnexpectedTokenError(
+                line_index + 1, prev + 1, line[prev])
+
+    def iter_tokens(self, stream, symbol_tables: dict = None):
+        """
+            Generator that lazily reads the source code line by line and yields the atoms as they are found.
+            Only the current line is kept in memory, so any text file object can be lexed regardless of its size.
+            Ids and constants are interned in separate symbol tables, never in the ones of the analyser, so streaming
+            doesn't change the reference counts used by analyze and edit.
+
+        Args:
+            stream (iterable<str>): the source code lines, e.g. an opened text file or a list of lines
+            symbol_tables (dict<str, SymbolTable>, optional): the symbol tables where ids and constants are interned,
+            see create_symbol_tables. Defaults to new symbol tables for this stream.
+
+        Raises:
+            UnexpectedTokenError: if the source code contains a token that is not part of the MLP
+
+        Yields:
+            Atom: the atoms of the source code, in order (including ids and constants)
+        """
+        if symbol_tables is None:
+            symbol_tables = self.create_symbol_tables()
+
+        for line_index, line in enumerate(stream):
+            yield from self.tokenize_line(line, line_index, symbol_tables)
+
     def analyze(self, source_code: list) -> (list, list, list, list):
-        """[summary]
+        """
+            Lexically analyzes the whole source code.
 
         Args:
-            self ([type]): [description]
-            list ([type]): [description]
-            list ([type]): [description]
-            list ([type]): [description]
+            source_code (iterable<str>): the source code lines
 
         Raises:
-            UnexpectedTokenError: [description]
+            UnexpectedTokenError: if the source code contains a token that is not part of the MLP
 
         Returns:
-            [type]: [description]
+            (list, list, list, list): the atoms (without ids and constants), the sorted ids, constants and string constants
         """
         self.__refresh()
         for line_index, line in enumerate(source_code):
-            line = line.strip().rstrip()
-            if not line:
-                continue
-
-            prev = 0
-            curr = 0
-            check_fas = True
-            while curr < len(line):
-                curr += 1
-                atom = None
-                line_part = line[prev:curr]
-                if check_fas:
-                    found = False
-                    line_rest = line[prev:]
-                    for fa in self.__fas:
-                        prefix = fa.get_longest_prefix(line_rest)
-                        if prefix:
-                            # ID OR CONST
-                            if fa.atom in self.__atoms:
-                                atom = Atom(prefix, fa.atom,
-                                            self.__atoms[fa.atom])
-                            # OPERATOR
-                            else:
-                                atom = Atom(fa.atom, prefix,
-                                            self.__atoms[prefix])
-
-                            found = True
-                            prev += len(prefix)
-                            curr = prev
-                            break
-
-                    # Stop checking the Finite Automatons because there are unexpected characters at the beginning.
-                    check_fas = found
-
-                # If check_fas is True, it means we found an accepted sequence by one of the fas.
-                if line_part in self.__atoms and not check_fas:
-                    atom = Atom(line_part, line_part, self.__atoms[line_part])
-                    prev = curr
-                    check_fas = True
-
-                if atom:
-                    self.__add_token(atom)
+            atoms = list(self.tokenize_line(line, line_index, self.__symbol_tables))
+            self.__line_atoms.append(atoms)
+            for atom in atoms:
+                self.__add_token(atom)
+
+        return self.__found_atoms, self.ids.sorted(), self.constants.sorted(), self.string_constants.sorted()
+
+    def edit(self, start: int, end: int, new_lines: list) -> list:
+        """
+            Replaces the lines between start and end (exclusive) of the analyzed source code and lexes only the new
+            lines. No token spans two lines, so the atoms of the other lines can't change. The references of the
+            removed atoms are dropped from the symbol tables, so ids and constants which are not used anymore are
+            removed, and the codes of the others don't change. If a new line can't be lexed nothing is changed.
+
+        Args:
+            start (int): the index of the first replaced line
+            end (int): the index after the last replaced line, start for an insertion
+            new_lines (iterable<str>): the new lines, empty for a deletion
+
+        Raises:
+            IndexError: if the lines are not inside the analyzed source code
+            UnexpectedTokenError: if a new line contains a token that is not part of the MLP
+
+        Returns:
+            list<list<Atom>>: the atoms of the new lines (including ids and constants)
+        """
+        if not 0 <= start <= end <= len(self.__line_atoms):
+            raise IndexError(f"Bad edit range [{start}, {end}) for {len(self.__line_atoms)} lines.")
+
+        # Add the new references before dropping the old ones, so an unchanged id keeps its code
+        new_line_atoms = self.__tokenize_lines(new_lines, start)
+        for atoms in self.__line_atoms[start:end]:
+            self.__discard_atoms(atoms)
 
-            if prev != curr:
-                raise UnexpectedTokenError(
-                    line_index + 1, prev + 1, line[prev])
-
-        # Get only the unique values
-        self.__found_ids = np.unique(
-            np.array([atom.token for atom in self.__found_ids]))
-        self.__found_constants = np.unique(
-            np.array([atom.token for atom in self.__found_constants]))
-        self.__found_string_constants = np.unique(
-            np.array([atom.token for atom in self.__found_string_constants]))
-        return self.__found_atoms, self.__found_ids, self.__found_constants, self.__found_string_constants
+        self.__line_atoms[start:end] = new_line_atoms
+        self.__found_atoms = None
+        return new_line_atoms
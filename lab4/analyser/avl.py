@@ -1,4 +1,13 @@
+import math
+import random
+from array import array
+
+import pytest
+
+
 class TreeNode:
+    __slots__ = ('value', 'left', 'right', 'height')
+
     def __init__(self, value):
         self.value = value
         self.left = None
@@ -245,6 +254,309 @@ class AVLTree:
         return nodes
 
 
+class CompactAVLTree:
+    """
+        AVL tree stored in parallel arrays instead of one TreeNode object per value.
+        A node is an index: values[node], left[node], right[node] (-1 if missing), heights[node] and sizes[node]
+        (the number of values in the subtree, used for position queries).
+    """
+    __slots__ = ('__values', '__left', '__right', '__heights', '__sizes', '__root')
+
+    def __init__(self):
+        self.__values = []
+        self.__left = array('i')
+        self.__right = array('i')
+        self.__heights = array('i')
+        self.__sizes = array('i')
+        self.__root = -1
+
+    @classmethod
+    def from_sorted(cls, values):
+        """
+            Builds a balanced tree from sorted values in O(n). The node of a value is its position in the input.
+
+        Args:
+            values (list): the values, in ascending order
+
+        Returns:
+            CompactAVLTree: the tree
+        """
+        tree = cls()
+        tree.__values = list(values)
+        count = len(tree.__values)
+        tree.__left = array('i', [-1]) * count
+        tree.__right = array('i', [-1]) * count
+        tree.__heights = array('i', [1]) * count
+        tree.__sizes = array('i', [1]) * count
+        tree.__root = tree.__build(0, count - 1)
+        return tree
+
+# region Private
+
+    def __build(self, low, high):
+        if low > high:
+            return -1
+
+        middle = (low + high) // 2
+        self.__left[middle] = self.__build(low, middle - 1)
+        self.__right[middle] = self.__build(middle + 1, high)
+        # Splitting at the middle gives a subtree with n nodes the minimum height
+        size = high - low + 1
+        self.__sizes[middle] = size
+        self.__heights[middle] = size.bit_length()
+        return middle
+
+    def __get_height(self, node):
+        if node == -1:
+            return 0
+
+        return self.__heights[node]
+
+    def __get_size(self, node):
+        if node == -1:
+            return 0
+
+        return self.__sizes[node]
+
+    def __update(self, node):
+        left = self.__left[node]
+        right = self.__right[node]
+        self.__heights[node] = 1 + max(self.__get_height(left), self.__get_height(right))
+        self.__sizes[node] = 1 + self.__get_size(left) + self.__get_size(right)
+
+    def __rotate_right(self, a):
+        b = self.__left[a]
+        self.__left[a] = self.__right[b]
+        self.__right[b] = a
+        self.__update(a)
+        self.__update(b)
+        return b
+
+    def __rotate_left(self, a):
+        b = self.__right[a]
+        self.__right[a] = self.__left[b]
+        self.__left[b] = a
+        self.__update(a)
+        self.__update(b)
+        return b
+
+    def __rebalance(self, node):
+        self.__update(node)
+        left = self.__left[node]
+        right = self.__right[node]
+        balance = self.__get_height(left) - self.__get_height(right)
+        # Left rotation necessary
+        if 1 < balance:
+            # Left-right rotation necessary
+            if self.__get_height(self.__left[left]) < self.__get_height(self.__right[left]):
+                self.__left[node] = self.__rotate_left(left)
+
+            return self.__rotate_right(node)
+        # Right rotation necessary
+        elif -1 > balance:
+            # Right-left rotation necessary
+            if self.__get_height(self.__right[right]) < self.__get_height(self.__left[right]):
+                self.__right[node] = self.__rotate_right(right)
+
+            return self.__rotate_left(node)
+
+        return node
+
+# endregion
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __contains__(self, value):
+        return self.find(value) != -1
+
+    def insert(self, value):
+        node = len(self.__values)
+        self.__values.append(value)
+        self.__left.append(-1)
+        self.__right.append(-1)
+        self.__heights.append(1)
+        self.__sizes.append(1)
+        if self.__root == -1:
+            self.__root = node
+            return
+
+        # Iterative descent, the path is rebalanced bottom-up afterwards
+        path = []
+        current = self.__root
+        while current != -1:
+            path.append(current)
+            if value < self.__values[current]:
+                current = self.__left[current]
+            else:
+                current = self.__right[current]
+
+        parent = path[-1]
+        if value < self.__values[parent]:
+            self.__left[parent] = node
+        else:
+            self.__right[parent] = node
+
+        for index in range(len(path) - 1, -1, -1):
+            current = path[index]
+            subtree_root = self.__rebalance(current)
+            if subtree_root == current:
+                continue
+
+            if index == 0:
+                self.__root = subtree_root
+            elif self.__left[path[index - 1]] == current:
+                self.__left[path[index - 1]] = subtree_root
+            else:
+                self.__right[path[index - 1]] = subtree_root
+
+    def find(self, value):
+        """
+            Get the node of a value.
+
+        Returns:
+            int: the node, -1 if the value is not in the tree
+        """
+        current = self.__root
+        while current != -1:
+            current_value = self.__values[current]
+            if value == current_value:
+                return current
+
+            current = self.__left[current] if value < current_value else self.__right[current]
+
+        return -1
+
+    def position_of(self, value):
+        """
+            Get the position of a value in the inorder traversal.
+
+        Returns:
+            int: the position, -1 if the value is not in the tree
+        """
+        position = 0
+        current = self.__root
+        while current != -1:
+            current_value = self.__values[current]
+            if value < current_value:
+                current = self.__left[current]
+            elif value == current_value:
+                return position + self.__get_size(self.__left[current])
+            else:
+                position += 1 + self.__get_size(self.__left[current])
+                current = self.__right[current]
+
+        return -1
+
+    def get_root(self):
+        return self.__root
+
+    def get_value(self, node):
+        return self.__values[node]
+
+    def get_left(self, node):
+        return self.__left[node]
+
+    def get_right(self, node):
+        return self.__right[node]
+
+    def get_height(self):
+        return self.__get_height(self.__root)
+
+    def inorder(self):
+        values = []
+        stack = []
+        current = self.__root
+        while stack or current != -1:
+            while current != -1:
+                stack.append(current)
+                current = self.__left[current]
+
+            current = stack.pop()
+            values.append(self.__values[current])
+            current = self.__right[current]
+
+        return values
+
+
+def __get_checked_height__(tree, node):
+    # The height of a subtree, after checking that every node of it is balanced
+    if node == -1:
+        return 0
+
+    left_height = __get_checked_height__(tree, tree.get_left(node))
+    right_height = __get_checked_height__(tree, tree.get_right(node))
+    assert abs(left_height - right_height) <= 1
+    return 1 + max(left_height, right_height)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [],
+        [5],
+        list(range(100)),
+        list(range(100, 0, -1)),
+        random.Random(7).sample(range(10000), 1000)
+    ]
+)
+def test__insert__(values):
+    tree = CompactAVLTree()
+    for value in values:
+        tree.insert(value)
+
+    assert len(tree) == len(values)
+    assert tree.inorder() == sorted(values)
+    assert __get_checked_height__(tree, tree.get_root()) == tree.get_height()
+    # An AVL tree with n nodes is less than 1.45 * log2(n + 2) high
+    assert tree.get_height() < 1.45 * math.log2(len(values) + 2)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [],
+        [5],
+        list(range(7)),
+        ['$a', '$b', '$c', '$max', '$min'],
+        sorted(random.Random(7).sample(range(10000), 1000))
+    ]
+)
+def test__from_sorted__(values):
+    tree = CompactAVLTree.from_sorted(values)
+    inserted = CompactAVLTree()
+    for value in values:
+        inserted.insert(value)
+
+    assert len(tree) == len(inserted)
+    assert tree.inorder() == inserted.inorder() == values
+    assert __get_checked_height__(tree, tree.get_root()) == tree.get_height()
+    # Bulk loading gives the minimum height, which repeated inserts can't beat
+    assert tree.get_height() == len(values).bit_length() <= inserted.get_height()
+
+
+@pytest.mark.parametrize(
+    "count",
+    [0, 1, 2, 50]
+)
+def test__find__position_of__(count):
+    # The even values are in the tree, the odd ones are missing
+    values = list(range(0, 2 * count, 2))
+    shuffled = random.Random(count).sample(values, count)
+    inserted = CompactAVLTree()
+    for value in shuffled:
+        inserted.insert(value)
+
+    for tree in (CompactAVLTree.from_sorted(values), inserted):
+        for position, value in enumerate(values):
+            assert value in tree and tree.get_value(tree.find(value)) == value
+            assert tree.position_of(value) == position
+
+        for value in range(-1, 2 * count + 1, 2):
+            assert value not in tree
+            assert tree.find(value) == -1 and tree.position_of(value) == -1
+
+
 if __name__ == "__main__":
     tree = AVLTree()
     tree.insert(30)
@@ -16,8 +16,13 @@ class UnexpectedTokenError(RuntimeError):
         self.__line = line
         self.__line_index = line_index
         self.__token = token
+        self.__extra_message = message
         self.__message = f"Unexpected token {token} on line {line} at {line_index}.\n{message}"
         super().__init__(self.__message)
 
+    def __reduce__(self):
+        # Rebuilt from the constructor arguments, so the error can be sent back from a worker process
+        return self.__class__, (self.__line, self.__line_index, self.__token, self.__extra_message)
+
     def __repr__(self):
         return f"Line: {self.__line}\nLine Index: {self.__line_index}\nToken: {self.__token}\n{super().__repr__()}"
@@ -0,0 +1,110 @@
+class SymbolTable:
+    """
+        Class that represents a symbol table (ids or constants).
+        A token is interned the first time it is added and receives a stable integer code (its position in the table).
+        Every add is counted, a token is removed when it is discarded as many times as it was added. The code of a
+        removed token is never given to another token.
+    """
+
+    def __init__(self):
+        self.__codes = {}
+        # The token and the reference count of every code, None and 0 for removed tokens
+        self.__tokens = []
+        self.__counts = []
+        self.__sorted_tokens = None
+
+    def __len__(self):
+        return len(self.__codes)
+
+    def __contains__(self, token):
+        return token in self.__codes
+
+    def __iter__(self):
+        return iter(self.__codes)
+
+    def __repr__(self):
+        return repr(self.__codes)
+
+    def add(self, token: str) -> int:
+        """
+            Interns a token.
+
+        Args:
+            token (str): the token
+
+        Returns:
+            int: the code of the token
+        """
+        code = self.__codes.get(token)
+        if code is None:
+            code = len(self.__tokens)
+            self.__codes[token] = code
+            self.__tokens.append(token)
+            self.__counts.append(0)
+            self.__sorted_tokens = None
+
+        self.__counts[code] += 1
+        return code
+
+    def discard(self, token: str) -> bool:
+        """
+            Drops a reference to a token, the token is removed with its last reference.
+
+        Args:
+            token (str): the token
+
+        Returns:
+            bool: True if the token was removed
+        """
+        code = self.__codes.get(token)
+        if code is None:
+            return False
+
+        self.__counts[code] -= 1
+        if self.__counts[code] > 0:
+            return False
+
+        del self.__codes[token]
+        self.__tokens[code] = None
+        self.__sorted_tokens = None
+        return True
+
+    def get_code(self, token: str) -> int:
+        """
+            Get the code of a token.
+
+        Args:
+            token (str): the token
+
+        Returns:
+            int: the code of the token, -1 if the token was not added
+        """
+        return self.__codes.get(token, -1)
+
+    def get_token(self, code: int) -> str:
+        return self.__tokens[code]
+
+    def get_count(self, token: str) -> int:
+        """
+            Get the number of references to a token.
+
+        Args:
+            token (str): the token
+
+        Returns:
+            int: the reference count, 0 if the token is not in the table
+        """
+        code = self.__codes.get(token)
+        return 0 if code is None else self.__counts[code]
+
+    def sorted(self) -> list:
+        """
+            Get the tokens in sorted order. The result is cached until a token is added or removed.
+
+        Returns:
+            list<str>: the sorted tokens
+        """
+        if self.__sorted_tokens is None:
+            self.__sorted_tokens = sorted(self.__codes)
+
+        return self.__sorted_tokens
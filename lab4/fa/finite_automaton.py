@@ -1,3 +1,5 @@
+from array import array
+
 from fa.transition import Transition
 from fa.errors import SymbolNotInAlphabetError, TransitionNotFoundError
 
@@ -23,6 +25,7 @@ class FiniteAutomaton:
         self.initial_state = initial_state
         self.final_states = final_states
         self.transitions = transitions
+        self.compile()
 
     def __repr__(self):
         all_trans = ""
@@ -32,26 +35,69 @@ class FiniteAutomaton:
 
         return f"Atom: {self.atom}\nStates: {self.states}\nAlphabet: {self.alphabet}\nTransitions: {all_trans}\nFinal states: {self.final_states}\n"
 
-    def __get_next_state(self, symbol: str, state: str) -> (str, bool):
+    def compile(self):
+        """
+            Compiles the finite automaton into a dense transition table.
+            The states and the alphabet are interned to integers and the transitions are stored in a flat array
+            indexed by state * |alphabet| + symbol, where -1 means that there is no transition.
+            Must be called again if the automaton is changed after initialization.
         """
-            Get the next state
+
+        self.__state_ids = {}
+        for state in [self.initial_state, *self.states, *self.final_states]:
+            self.__state_ids.setdefault(state, len(self.__state_ids))
+
+        for state, transitions in self.transitions.items():
+            self.__state_ids.setdefault(state, len(self.__state_ids))
+            for transition in transitions:
+                self.__state_ids.setdefault(transition.state, len(self.__state_ids))
+
+        self.__symbol_ids = {}
+        for symbol in self.alphabet:
+            self.__symbol_ids.setdefault(symbol, len(self.__symbol_ids))
+
+        self.__alphabet_size = len(self.__symbol_ids)
+        self.__table = array('i', [-1]) * (len(self.__state_ids) * self.__alphabet_size)
+        for state, transitions in self.transitions.items():
+            offset = self.__state_ids[state] * self.__alphabet_size
+            for transition in transitions:
+                for symbol in transition.symbols:
+                    symbol_id = self.__symbol_ids.get(symbol)
+                    # The first transition that matches a symbol wins, symbols outside the alphabet are never read.
+                    if symbol_id is not None and self.__table[offset + symbol_id] == -1:
+                        self.__table[offset + symbol_id] = self.__state_ids[transition.state]
+
+        self.__state_names = list(self.__state_ids)
+        self.__final_state_ids = bytearray(len(self.__state_ids))
+        for state in self.final_states:
+            self.__final_state_ids[self.__state_ids[state]] = 1
+
+        self.__initial_state_id = self.__state_ids[self.initial_state]
+
+    @property
+    def initial_state_id(self) -> int:
+        return self.__initial_state_id
+
+    def get_next_state_id(self, state_id: int, symbol: str) -> int:
+        """
+            Get the next state from the compiled transition table.
 
         Args:
-            symbol (str): Specifies the symbol to move from the current state to the next one.e
-            state (str): Specifies the current state.
+            state_id (int): the current state as returned by compile
+            symbol (str): the symbol read from the current state
 
         Returns:
-            (str, bool): Returns a tuple formed from a str representing the state and a boolean representing wheter or not the state changed.
+            int: the next state or -1 if the symbol is not in the alphabet or there is no transition
         """
 
-        state_changed = False
-        for transition in self.transitions.get(state, []):
-            if symbol in transition.symbols:
-                state = transition.state
-                state_changed = True
-                break
+        symbol_id = self.__symbol_ids.get(symbol)
+        if symbol_id is None:
+            return -1
 
-        return (state, state_changed)
+        return self.__table[state_id * self.__alphabet_size + symbol_id]
+
+    def is_final_state_id(self, state_id: int) -> bool:
+        return bool(self.__final_state_ids[state_id])
 
     def check_sequence(self, sequence: list) -> bool:
         """
@@ -64,23 +110,28 @@ class FiniteAutomaton:
             bool: true if the sequence is accepted, false otherwise
         """
 
-        state = self.initial_state
+        symbol_ids = self.__symbol_ids
+        alphabet_size = self.__alphabet_size
+        table = self.__table
+        state_id = self.__initial_state_id
         for symbol in sequence:
-            if symbol not in self.alphabet:
+            symbol_id = symbol_ids.get(symbol)
+            if symbol_id is None:
                 raise SymbolNotInAlphabetError(symbol, self.alphabet)
 
-            state, state_changed = self.__get_next_state(symbol, state)
-            if not state_changed:
-                raise TransitionNotFoundError(symbol, state)
+            next_state_id = table[state_id * alphabet_size + symbol_id]
+            if next_state_id == -1:
+                raise TransitionNotFoundError(symbol, self.__state_names[state_id])
 
-        if state not in self.final_states:
-            return False
+            state_id = next_state_id
 
-        return True
+        return bool(self.__final_state_ids[state_id])
 
     def get_longest_prefix(self, sequence: list) -> str:
         """
             Returns the longest prefix of symbols that is accepted by the finite automaton.
+            The sequence is walked only once (maximal munch), remembering the last position where the automaton
+            was in a final state.
 
         Args:
             sequence (list): list of symbols to move from one state to another
@@ -88,23 +139,26 @@ class FiniteAutomaton:
         Returns:
             str: the longest prefix
         """
-        state = self.initial_state
+
+        symbol_ids = self.__symbol_ids
+        alphabet_size = self.__alphabet_size
+        table = self.__table
+        final_state_ids = self.__final_state_ids
+        state_id = self.__initial_state_id
         prefix_end_index = 0
-        for symbol in sequence:
-            if symbol not in self.alphabet:
+        for index, symbol in enumerate(sequence, 1):
+            symbol_id = symbol_ids.get(symbol)
+            if symbol_id is None:
                 break
 
-            state, state_changed = self.__get_next_state(symbol, state)
-            if not state_changed:
+            state_id = table[state_id * alphabet_size + symbol_id]
+            if state_id == -1:
                 break
 
-            prefix_end_index += 1
-
-        prefix = sequence[:prefix_end_index]
-        while prefix and not self.check_sequence(prefix):
-            prefix = prefix[:-1]
+            if final_state_ids[state_id]:
+                prefix_end_index = index
 
-        return prefix
+        return sequence[:prefix_end_index]
 
 
 def load_fa_from_file(path: str) -> FiniteAutomaton:
@@ -0,0 +1,118 @@
+from array import array
+from collections import deque
+
+from fa.finite_automaton import FiniteAutomaton
+
+
+class TokenAutomaton:
+    """Class that represents the product of several finite automata, used to recognize any of their atoms in one pass.
+    """
+
+    def __init__(self, fas: list):
+        """Initializes a token automaton class by merging the given finite automata into one product automaton.
+        Each product state is a tuple with the current state of every automaton (-1 if it is stuck). A product state
+        is final if one of its automata is in a final state, and it is tagged with the first such automaton (the one
+        with the highest priority).
+
+        Args:
+            fas (list<FiniteAutomaton>): the finite automata, ordered by priority (first one has the highest priority)
+        """
+        self.__fas = fas
+
+        self.__symbol_ids = {}
+        for fa in fas:
+            for symbol in fa.alphabet:
+                self.__symbol_ids.setdefault(symbol, len(self.__symbol_ids))
+
+        self.__alphabet_size = len(self.__symbol_ids)
+        self.__table = array('i')
+        self.__priorities = []
+        self.__build()
+
+    def __build(self):
+        """
+            Explores the reachable product states breadth first and fills the transition table.
+        """
+
+        def __add_state__(product_state: tuple) -> int:
+            state_id = state_ids.get(product_state)
+            if state_id is None:
+                state_id = len(state_ids)
+                state_ids[product_state] = state_id
+                self.__table.extend([-1] * self.__alphabet_size)
+                self.__priorities.append(self.__get_priority(product_state))
+                dq.append(product_state)
+
+            return state_id
+
+        state_ids = {}
+        dq = deque()
+        __add_state__(tuple(fa.initial_state_id for fa in self.__fas))
+        while len(dq) > 0:
+            product_state = dq.popleft()
+            offset = state_ids[product_state] * self.__alphabet_size
+            for symbol, symbol_id in self.__symbol_ids.items():
+                next_product_state = tuple(
+                    -1 if state_id == -1 else fa.get_next_state_id(state_id, symbol)
+                    for fa, state_id in zip(self.__fas, product_state))
+                # Every automaton is stuck, there is no transition.
+                if all(state_id == -1 for state_id in next_product_state):
+                    continue
+
+                self.__table[offset + symbol_id] = __add_state__(next_product_state)
+
+    def __get_priority(self, product_state: tuple) -> int:
+        """
+            Get the priority of a product state.
+
+        Args:
+            product_state (tuple<int>): the state of every automaton
+
+        Returns:
+            int: the index of the first automaton which is in a final state, -1 if there is none
+        """
+
+        for priority, (fa, state_id) in enumerate(zip(self.__fas, product_state)):
+            if state_id != -1 and fa.is_final_state_id(state_id):
+                return priority
+
+        return -1
+
+    def get_longest_token(self, sequence: str) -> (FiniteAutomaton, str):
+        """
+            Returns the token at the beginning of the sequence. The result is the same as asking every automaton, in
+            order, for its longest accepted prefix and keeping the first non-empty one.
+
+        Args:
+            sequence (str): list of symbols to move from one state to another
+
+        Returns:
+            (FiniteAutomaton, str): the automaton which accepted the token and the token, (None, "") if there is none
+        """
+
+        symbol_ids = self.__symbol_ids
+        alphabet_size = self.__alphabet_size
+        table = self.__table
+        priorities = self.__priorities
+        state_id = 0
+        best_priority = len(self.__fas)
+        prefix_end_index = 0
+        for index, symbol in enumerate(sequence, 1):
+            symbol_id = symbol_ids.get(symbol)
+            if symbol_id is None:
+                break
+
+            state_id = table[state_id * alphabet_size + symbol_id]
+            if state_id == -1:
+                break
+
+            # A state is tagged with its highest priority automaton, so a lower priority can't win any more.
+            priority = priorities[state_id]
+            if priority != -1 and priority <= best_priority:
+                best_priority = priority
+                prefix_end_index = index
+
+        if not prefix_end_index:
+            return None, ""
+
+        return self.__fas[best_priority], sequence[:prefix_end_index]
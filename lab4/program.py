@@ -1,8 +1,15 @@
 import os
 import json
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pytest
+
 from fa.finite_automaton import load_fa_from_file
 from analyser.analyser import Analyser
-from analyser.avl import AVLTree
+from analyser.errors import UnexpectedTokenError
+from analyser.symbol_table import SymbolTable
 
 
 def load_fas(path):
@@ -25,28 +32,165 @@ def load_config(path):
     return atoms
 
 
-def load_source_code(path):
-    source_code = None
-    with open(path) as fin:
-        source_code = fin.readlines()
-
-    return source_code
-
-
-def get_inorder(X: list) -> list:
-    tree = AVLTree()
-    for x in X:
-        tree.insert(x)
-
-    return tree.inorder()
-
-
 def write_to_file(path, writable, mode='w'):
     with open(path, mode) as fout:
         fout.write(writable)
         fout.flush()
 
 
+# The lexer of the current worker process, see init_worker.
+worker_lexer = None
+
+
+def init_worker(fa_dir_path, config_path):
+    global worker_lexer
+    worker_lexer = Analyser(load_config(config_path), load_fas(fa_dir_path))
+
+
+def lex_file(fin, fout, lexer=None):
+    """
+        Lexes a source code file and writes the result with a single write.
+
+    Args:
+        fin (str): path to the source code file
+        fout (str): path to the output file
+        lexer (Analyser, optional): the lexer. Defaults to the lexer of the current worker process.
+
+    Returns:
+        float: the elapsed time in seconds
+    """
+    start = time.perf_counter()
+    lexer = lexer or worker_lexer
+    with open(fin) as source_code:
+        atoms, ids, consts, string_consts = lexer.analyze(source_code)
+
+    writable = "\n".join([str(atom) for atom in atoms])
+    # The symbol tables are already sorted
+    write_to_file(fout, f"IDS: {ids}\n\n"
+                        f"CONSTS: {consts}\n\n"
+                        f"STRING_CONSTS: {string_consts}\n\n"
+                        f"ATOMS:\n{writable}\n\n")
+    return time.perf_counter() - start
+
+
+def lex_directory(dir_in, dir_out, fa_dir_path, config_path, max_workers=None):
+    """
+        Lexes every file from a directory in parallel. Each worker process loads the finite automata once.
+
+    Args:
+        dir_in (str): the directory with the source code files
+        dir_out (str): the directory where the results are written, with the same file names
+        fa_dir_path (str): the directory with the finite automata
+        config_path (str): path to the atoms configuration
+        max_workers (int, optional): the number of worker processes. Defaults to the number of processors.
+
+    Returns:
+        (dict<str, float>, dict<str, Exception>): the elapsed time in seconds for each lexed file and the error of
+        each file which couldn't be lexed
+    """
+    timings = {}
+    errors = {}
+    with ProcessPoolExecutor(max_workers, initializer=init_worker, initargs=(fa_dir_path, config_path)) as executor:
+        futures = {}
+        for file in os.listdir(dir_in):
+            fin = os.path.join(dir_in, file)
+            if os.path.isfile(fin):
+                fout = os.path.join(dir_out, file)
+                futures[executor.submit(lex_file, fin, fout)] = file
+
+        for future in as_completed(futures):
+            file = futures[future]
+            try:
+                timings[file] = future.result()
+                print(f"{file}: {timings[file]:.4f}s")
+            except Exception as error:
+                # A bad file (unexpected token, bad encoding, unreadable) doesn't stop the other files
+                errors[file] = error
+                print(f"{file}: {type(error).__name__}: {error}")
+
+    return timings, errors
+
+
+def test__lex_directory__bad_file__(tmp_path):
+    lab_path = os.path.dirname(os.path.abspath(__file__))
+    dir_in = os.path.join(tmp_path, "in")
+    dir_out = os.path.join(tmp_path, "out")
+    os.makedirs(dir_in)
+    os.makedirs(dir_out)
+    for file in ("1.txt", "2.txt"):
+        shutil.copy(os.path.join(lab_path, "analyser", "in", file), dir_in)
+
+    write_to_file(os.path.join(dir_in, "bad.txt"), "$a = 1\n$b = 2 \u00a7\n")
+    write_to_file(os.path.join(dir_in, "undecodable.txt"), b"$a = 1\n$b = \xff\n", 'wb')
+
+    # The files which can't be lexed don't break the other files of the batch
+    timings, errors = lex_directory(dir_in, dir_out, os.path.join(lab_path, "fa", "fas"),
+                                    os.path.join(lab_path, "analyser", "powershell.json"), max_workers=2)
+    assert sorted(timings) == ["1.txt", "2.txt"]
+    assert sorted(os.listdir(dir_out)) == ["1.txt", "2.txt"]
+    assert sorted(errors) == ["bad.txt", "undecodable.txt"]
+    assert isinstance(errors["bad.txt"], UnexpectedTokenError)
+
+
+def test__symbol_table__discard__():
+    table = SymbolTable()
+    assert [table.add(token) for token in ("$a", "$b", "$a")] == [0, 1, 0]
+    assert table.get_count("$a") == 2
+    assert not table.discard("$a")
+    assert table.discard("$a")
+    assert not table.discard("$a")
+    assert "$a" not in table and len(table) == 1 and table.sorted() == ["$b"]
+    # The code of a removed token is never given to another token
+    assert table.add("$a") == 2
+    assert table.get_code("$b") == 1 and table.get_token(0) is None
+
+
+@pytest.mark.parametrize(
+    "start,end,new_lines",
+    [
+        (2, 3, ["[int]$max = 10;"]),
+        (0, 1, []),
+        (4, 4, ["$d = $min + \"x\";", "$e = 5;"]),
+        (0, 21, [])
+    ]
+)
+def test__analyser__edit__(start, end, new_lines):
+    lab_path = os.path.dirname(os.path.abspath(__file__))
+    atoms = load_config(os.path.join(lab_path, "analyser", "powershell.json"))
+    fas = load_fas(os.path.join(lab_path, "fa", "fas"))
+    with open(os.path.join(lab_path, "analyser", "in", "1.txt")) as fin:
+        lines = fin.read().split("\n")
+
+    analyser = Analyser(atoms, fas)
+    analyser.analyze(lines)
+    codes = {token: analyser.ids.get_code(token) for token in analyser.ids}
+    counts = {token: analyser.ids.get_count(token) for token in analyser.ids}
+
+    # Streaming uses its own symbol tables
+    list(analyser.iter_tokens(lines))
+    assert {token: analyser.ids.get_count(token) for token in analyser.ids} == counts
+
+    # A line which can't be lexed leaves everything as it was
+    with pytest.raises(UnexpectedTokenError):
+        analyser.edit(start, end, new_lines + ["$f = 1 \u00a7"])
+
+    assert {token: analyser.ids.get_code(token) for token in analyser.ids} == codes
+
+    analyser.edit(start, end, new_lines)
+    lines[start:end] = new_lines
+    expected = Analyser(atoms, fas)
+    expected_atoms, *expected_tables = expected.analyze(lines)
+    assert [repr(atom) for atom in analyser.found_atoms] == [repr(atom) for atom in expected_atoms]
+    assert [analyser.ids.sorted(), analyser.constants.sorted(), analyser.string_constants.sorted()] == expected_tables
+    for table, expected_table in ((analyser.ids, expected.ids), (analyser.constants, expected.constants),
+                                  (analyser.string_constants, expected.string_constants)):
+        assert {token: table.get_count(token) for token in table} == \
+               {token: expected_table.get_count(token) for token in expected_table}
+
+    # The ids which are still used keep their codes
+    assert all(analyser.ids.get_code(token) == codes[token] for token in analyser.ids if token in codes)
+
+
 if __name__ == '__main__':
     # Paths
     fa_dir_path = os.path.join(os.getcwd(), "lab4\\fa\\fas")
@@ -54,21 +198,7 @@ if __name__ == '__main__':
     source_code_dir_in = os.path.join(os.getcwd(), "lab4\\analyser\\in")
     source_code_dir_out = os.path.join(os.getcwd(), "lab4\\analyser\\out")
 
-    # Prep
-    fas = load_fas(fa_dir_path)
-    atoms = load_config(config_path)
-    lexer = Analyser(atoms, fas)
-
     # Work
-    for file in os.listdir(source_code_dir_in):
-        fin = os.path.join(source_code_dir_in, file)
-        fout = os.path.join(source_code_dir_out, file)
-        atoms, ids, consts, string_consts = lexer.analyze(
-            load_source_code(fin))
-
-        write_to_file(fout, f"IDS: {get_inorder(ids)}\n\n", 'w')
-        write_to_file(fout, f"CONSTS: {get_inorder(consts)}\n\n", 'a')
-        write_to_file(
-            fout, f"STRING_CONSTS: {get_inorder(string_consts)}\n\n", 'a')
-        writable = "\n".join([str(atom) for atom in atoms])
-        write_to_file(fout, f"ATOMS:\n{writable}\n\n", 'a')
+    start = time.perf_counter()
+    timings, errors = lex_directory(source_code_dir_in, source_code_dir_out, fa_dir_path, config_path)
+    print(f"Lexed {len(timings)} files in {time.perf_counter() - start:.4f}s, {len(errors)} failed")
@@ -1,7 +1,10 @@
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Optional, Tuple
 from uuid import uuid1, UUID
 import re
 
+import pytest
+
+from lab9.grammar.precedence import Precedence
 from lab9.grammar.production_rule import ProductionRule
 from lab9.grammar.symbols.dollar import Dollar
 from lab9.grammar.symbols.epsilon import Epsilon
@@ -16,11 +19,13 @@ class Grammar:
     """
 
     def __init__(self, nonterminals: List[Nonterminal], terminals: List[Terminal],
-                 production_rules: List[ProductionRule]):
+                 production_rules: List[ProductionRule], precedences: Dict[Terminal, Precedence] = None):
         self.__nonterminals = nonterminals
         self.__terminals = terminals
         self.__production_rules = production_rules
+        self.__precedences = precedences if precedences is not None else {}
         self.__start_symbol = self.__production_rules[0].lhs
+        self.__build_indexes()
 
     # region Getters and Setters
 
@@ -40,18 +45,96 @@ class Grammar:
     def start_symbol(self) -> Nonterminal:
         return self.__start_symbol
 
+    @property
+    def precedences(self) -> Dict[Terminal, Precedence]:
+        return self.__precedences
+
     # endregion
 
     def __repr__(self):
         newline = '\n'
+        precedences = ', '.join(f"{repr(terminal)} {repr(precedence)}"
+                                for terminal, precedence in self.__precedences.items())
         return f"Nonterminals: {', '.join(repr(nonterminal) for nonterminal in self.__nonterminals)}\n" + \
                f"Terminals: {', '.join(repr(terminal) for terminal in self.__terminals)}\n" + \
-               f"Production rules:\n{newline.join(repr(production_rule) for production_rule in self.__production_rules)}\n "
+               f"Production rules:\n{newline.join(repr(production_rule) for production_rule in self.__production_rules)}\n " + \
+               (f"\nPrecedences: {precedences}\n " if precedences else '')
 
     def __str__(self):
         return repr(self)
 
-    def get_production_rules_by_lhs_nonterminal(self, nonterminal: Nonterminal) -> List[ProductionRule]:
+    def __build_indexes(self):
+        """
+            Index the production rules by their lhs nonterminal, by the symbols in their rhs and by their position.
+        """
+
+        self.__nonterminals_set: Set[Nonterminal] = set(self.__nonterminals)
+        self.__terminals_set: Set[Terminal] = set(self.__terminals)
+        production_rules_by_lhs: Dict[Nonterminal, List[ProductionRule]] = {}
+        production_rules_by_rhs: Dict[Symbol, List[ProductionRule]] = {}
+        self.__production_rule_indexes: Dict[ProductionRule, int] = {}
+        self.__production_rule_precedences: Dict[ProductionRule, Precedence] = {}
+        for index, production_rule in enumerate(self.__production_rules):
+            # A production rule has the precedence of its last terminal which has one
+            for symbol in reversed(production_rule.rhs):
+                if symbol in self.__precedences:
+                    self.__production_rule_precedences[production_rule] = self.__precedences[symbol]
+                    break
+
+            production_rules_by_lhs.setdefault(production_rule.lhs, []).append(production_rule)
+            # A production rule is indexed once for every distinct rhs symbol
+            for symbol in dict.fromkeys(production_rule.rhs):
+                production_rules_by_rhs.setdefault(symbol, []).append(production_rule)
+
+            self.__production_rule_indexes.setdefault(production_rule, index)
+
+        # The getters return the indexes themselves, as tuples a caller can't change them
+        self.__production_rules_by_lhs: Dict[Nonterminal, Tuple[ProductionRule, ...]] = {
+            nonterminal: tuple(production_rules) for nonterminal, production_rules in production_rules_by_lhs.items()}
+        self.__production_rules_by_rhs: Dict[Symbol, Tuple[ProductionRule, ...]] = {
+            symbol: tuple(production_rules) for symbol, production_rules in production_rules_by_rhs.items()}
+
+    def get_production_rule_index(self, production_rule: ProductionRule) -> int:
+        """
+            Return the position of the given production rule.
+
+        Args:
+            production_rule (ProductionRule): The query production rule
+
+        Returns:
+            int: The index of the first equal production rule, -1 if it is not part of the grammar
+        """
+
+        return self.__production_rule_indexes.get(production_rule, -1)
+
+    def get_precedence_of_terminal(self, terminal: Terminal) -> Optional[Precedence]:
+        """
+            Return the declared precedence of a terminal.
+
+        Args:
+            terminal (Terminal): The query terminal
+
+        Returns:
+            Optional[Precedence]: The precedence, None if it was not declared
+        """
+
+        return self.__precedences.get(terminal)
+
+    def get_precedence_of_production_rule(self, production_rule: ProductionRule) -> Optional[Precedence]:
+        """
+            Return the precedence of a production rule, i.e. the precedence of the last terminal of its rhs which
+            has a declared precedence.
+
+        Args:
+            production_rule (ProductionRule): The query production rule
+
+        Returns:
+            Optional[Precedence]: The precedence, None if no terminal of the rhs has one
+        """
+
+        return self.__production_rule_precedences.get(production_rule)
+
+    def get_production_rules_by_lhs_nonterminal(self, nonterminal: Nonterminal) -> Tuple[ProductionRule, ...]:
         """
             Return all production rules that have as lhs the given nonterminal.
 
@@ -59,20 +142,15 @@ class Grammar:
             nonterminal (Nonterminal): The query nonterminal
 
         Returns:
-            List[ProductionRule]: All the production rules that have as lhs the query nonterminal
+            Tuple[ProductionRule, ...]: All the production rules that have as lhs the query nonterminal
         """
 
-        matching_production_rules = []
-        if nonterminal not in self.__nonterminals:
-            return []
+        if nonterminal not in self.__nonterminals_set:
+            return ()
 
-        for production_rule in self.__production_rules:
-            if production_rule.lhs == nonterminal:
-                matching_production_rules.append(production_rule)
+        return self.__production_rules_by_lhs.get(nonterminal, ())
 
-        return matching_production_rules
-
-    def get_production_rules_by_rhs_nonterminal(self, nonterminal: Nonterminal) -> List[ProductionRule]:
+    def get_production_rules_by_rhs_nonterminal(self, nonterminal: Nonterminal) -> Tuple[ProductionRule, ...]:
         """
             Return all production rules that have as rhs the given nonterminal.
 
@@ -80,20 +158,15 @@ class Grammar:
             nonterminal (Nonterminal): The query nonterminal
 
         Returns:
-            List[ProductionRule]: All the production rules that have as rhs the query nonterminal
+            Tuple[ProductionRule, ...]: All the production rules that have as rhs the query nonterminal
         """
 
-        matching_production_rules = []
-        if nonterminal not in self.__nonterminals:
-            return []
-
-        for production_rule in self.__production_rules:
-            if nonterminal in production_rule.rhs:
-                matching_production_rules.append(production_rule)
+        if nonterminal not in self.__nonterminals_set:
+            return ()
 
-        return matching_production_rules
+        return self.__production_rules_by_rhs.get(nonterminal, ())
 
-    def get_production_rules_by_rhs_terminal(self, terminal: Terminal) -> List[ProductionRule]:
+    def get_production_rules_by_rhs_terminal(self, terminal: Terminal) -> Tuple[ProductionRule, ...]:
         """
             Return all production rules that have as rhs the given terminal.
 
@@ -101,15 +174,41 @@ class Grammar:
             terminal (Nonterminal): The query terminal
 
         Returns:
-            List[ProductionRule]: All the production rules that have as rhs the query terminal
+            Tuple[ProductionRule, ...]: All the production rules that have as rhs the query terminal
         """
 
-        matching_production_rules = []
-        if terminal not in self.__terminals:
-            return []
-
-        for production_rule in self.__production_rules:
-            if terminal in production_rule.rhs:
-                matching_production_rules.append(production_rule)
-
-        return matching_production_rules
+        if terminal not in self.__terminals_set:
+            return ()
+
+        return self.__production_rules_by_rhs.get(terminal, ())
+
+
+@pytest.mark.parametrize(
+    "symbol,by_lhs,by_rhs",
+    [
+        (Nonterminal('S'), [0, 1], []),
+        (Nonterminal('A'), [2, 3], [0, 2]),
+        (Terminal('a'), [], [1, 2]),
+        (Terminal('c'), [], [])
+    ]
+)
+def test__indexes__(symbol, by_lhs, by_rhs):
+    production_rules = [
+        ProductionRule(Nonterminal('S'), [Nonterminal('A'), Terminal('b'), Nonterminal('A')]),
+        ProductionRule(Nonterminal('S'), [Terminal('a')]),
+        ProductionRule(Nonterminal('A'), [Terminal('a'), Nonterminal('A')]),
+        ProductionRule(Nonterminal('A'), [Epsilon()])
+    ]
+    grammar = Grammar([Nonterminal('S'), Nonterminal('A')], [Terminal('a'), Terminal('b')], production_rules)
+    if isinstance(symbol, Nonterminal):
+        assert grammar.get_production_rules_by_lhs_nonterminal(symbol) == tuple(production_rules[i] for i in by_lhs)
+        assert grammar.get_production_rules_by_rhs_nonterminal(symbol) == tuple(production_rules[i] for i in by_rhs)
+    else:
+        assert grammar.get_production_rules_by_rhs_terminal(symbol) == tuple(production_rules[i] for i in by_rhs)
+
+    for index, production_rule in enumerate(production_rules):
+        assert grammar.get_production_rule_index(production_rule) == index
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
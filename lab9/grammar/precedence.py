@@ -0,0 +1,51 @@
+from enum import Enum
+
+
+class Associativity(Enum):
+    """
+        Class that represents the associativity of a terminal, as declared by %left, %right or %nonassoc.
+    """
+
+    LEFT = 'left'
+    RIGHT = 'right'
+    NONASSOC = 'nonassoc'
+
+    def __repr__(self):
+        return self.name
+
+    def __str__(self):
+        return repr(self)
+
+
+class Precedence:
+    """
+        Class that represents the precedence of a terminal. Terminals declared on later lines bind tighter,
+        i.e. have a greater level.
+    """
+
+    def __init__(self, level: int, associativity: Associativity):
+        self.__level = level
+        self.__associativity = associativity
+
+    @property
+    def level(self) -> int:
+        return self.__level
+
+    @property
+    def associativity(self) -> Associativity:
+        return self.__associativity
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Precedence) and self.__dict__ == other.__dict__
+
+    def __ne__(self, other) -> bool:
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.__level, self.__associativity))
+
+    def __repr__(self):
+        return f"{self.__associativity} {self.__level}"
+
+    def __str__(self):
+        return repr(self)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Sequence, Tuple
 from uuid import uuid1, UUID
 
 import pytest
@@ -13,10 +13,12 @@ class ProductionRule:
         Class that represents a context-free grammar (CFG) production rule.
     """
 
-    def __init__(self, lhs: Nonterminal, rhs: List[Symbol], production_rule_id: UUID = uuid1()):
+    def __init__(self, lhs: Nonterminal, rhs: Sequence[Symbol], production_rule_id: UUID = uuid1()):
         self.__id = production_rule_id
         self.__lhs = lhs
-        self.__rhs = rhs
+        # Immutable, so the cached hash can't go stale if the caller changes its list
+        self.__rhs = tuple(rhs)
+        self.__hash = hash((lhs, *self.__rhs))
 
     @property
     def id(self) -> UUID:
@@ -27,7 +29,7 @@ class ProductionRule:
         return self.__lhs
 
     @property
-    def rhs(self) -> List[Symbol]:
+    def rhs(self) -> Tuple[Symbol, ...]:
         return self.__rhs
 
     def __eq__(self, other) -> bool:
@@ -37,7 +39,7 @@ class ProductionRule:
         return not self.__eq__(other)
 
     def __hash__(self):
-        return hash(self.__id)
+        return self.__hash
 
     def __repr__(self):
         return f'{repr(self.__lhs)}->{" ".join([repr(symbol) for symbol in self.__rhs])}'
@@ -67,5 +69,15 @@ def test__eq__(a_lhs, a_rhs, b_lhs, b_rhs, result):
     assert (a == b) == result
 
 
+def test__hash__():
+    rhs = [Terminal('a'), Nonterminal('A')]
+    production_rule = ProductionRule(Nonterminal('A'), rhs)
+    production_rules = {production_rule}
+    rhs.append(Terminal('b'))
+    assert production_rule.rhs == (Terminal('a'), Nonterminal('A'))
+    assert production_rule in production_rules
+    assert ProductionRule(Nonterminal('A'), [Terminal('a'), Nonterminal('A')], production_rule.id) in production_rules
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
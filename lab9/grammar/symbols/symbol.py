@@ -1,9 +1,33 @@
+import pickle
+from typing import Dict
+
 import pytest
 
 
-class Symbol:
+class InternedSymbolMeta(type):
+    """
+        Metaclass that hash-conses symbols. Constructing a symbol that was already constructed returns the same
+        instance, so every symbol is a singleton with a small integer id assigned in order of creation.
+    """
+
+    __instances: Dict[tuple, 'Symbol'] = {}
+
+    def __call__(cls, *args):
+        key = (cls, *args)
+        instance = InternedSymbolMeta.__instances.get(key)
+        if instance is None:
+            instance = super().__call__(*args)
+            instance._args = args
+            instance._id = len(InternedSymbolMeta.__instances)
+            InternedSymbolMeta.__instances[key] = instance
+
+        return instance
+
+
+class Symbol(metaclass=InternedSymbolMeta):
     """
         Class that represents a context-free grammar (CFG) symbol.
+        Symbols are interned, so two symbols are equal only if they are the same instance.
     """
 
     def __init__(self, symbol: str):
@@ -16,9 +40,9 @@ class Symbol:
     def symbol(self) -> str:
         return self._symbol
 
-    @symbol.setter
-    def symbol(self, value: str):
-        self._symbol = value
+    @property
+    def id(self) -> int:
+        return self._id
 
     @staticmethod
     def check_symbol(s: str) -> bool:
@@ -31,13 +55,17 @@ class Symbol:
         return repr(self)
 
     def __eq__(self, other) -> bool:
-        return isinstance(other, Symbol) and self.__dict__ == other.__dict__
+        return self is other
 
     def __ne__(self, other) -> bool:
-        return not self.__eq__(other)
+        return self is not other
 
     def __hash__(self):
-        return hash(self._symbol)
+        return self._id
+
+    def __reduce__(self):
+        # Unpickling goes through the metaclass so that the interned instance is returned.
+        return self.__class__, self._args
 
 
 @pytest.mark.parametrize(
@@ -51,5 +79,18 @@ def test__eq__(a, b, result):
     assert (a == b) == result
 
 
+@pytest.mark.parametrize(
+    "a,b,result",
+    [
+        (Symbol('a'), Symbol('a'), True),
+        (Symbol('a'), Symbol('b'), False)
+    ]
+)
+def test__interned__(a, b, result):
+    assert (a is b) == result
+    assert (a.id == b.id) == result
+    assert pickle.loads(pickle.dumps(a)) is a
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
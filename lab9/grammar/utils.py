@@ -1,10 +1,22 @@
+import os
+
+import pytest
+
 from lab9.grammar.grammar import Grammar
+from lab9.grammar.precedence import Associativity, Precedence
 from lab9.grammar.production_rule import ProductionRule
 from lab9.grammar.symbols.epsilon import Epsilon
 from lab9.grammar.symbols.nonterminal import Nonterminal
 from lab9.grammar.symbols.terminal import Terminal
 
 
+PRECEDENCE_DIRECTIVES = {
+    '%left': Associativity.LEFT,
+    '%right': Associativity.RIGHT,
+    '%nonassoc': Associativity.NONASSOC
+}
+
+
 class LoadGrammarError(RuntimeError):
     """
         Error thrown when the given input file is not a correct context-free grammar (CFG).
@@ -17,6 +29,8 @@ class LoadGrammarError(RuntimeError):
 def load_grammar(path: str) -> Grammar:
     """
         Load a CFG from file.
+        Lines starting with %left, %right or %nonassoc declare the precedence and associativity of the terminals
+        which follow, like in yacc. Terminals declared on later lines have a greater precedence.
 
     Args:
         path (str): Path to the CFG file
@@ -28,11 +42,22 @@ def load_grammar(path: str) -> Grammar:
     nonterminals = set()
     terminals = set()
     production_rules = []
+    precedences = {}
+    precedence_level = 0
     try:
         with open(path) as fin:
             for line in fin:
                 line = line.strip().rstrip()
-                if line:
+                if line.startswith('%'):
+                    # Precedence declaration, e.g. %left + -
+                    directive, *names = [name for name in line.split(' ') if name]
+                    if directive not in PRECEDENCE_DIRECTIVES or len(names) == 0:
+                        raise LoadGrammarError()
+
+                    precedence_level += 1
+                    for name in names:
+                        precedences[Terminal(name)] = Precedence(precedence_level, PRECEDENCE_DIRECTIVES[directive])
+                elif line:
                     lhs, rhs = line.split('->')
                     if not Nonterminal.check_symbol(lhs) or Epsilon.check_symbol(lhs):
                         raise LoadGrammarError()
@@ -70,4 +95,55 @@ def load_grammar(path: str) -> Grammar:
     except Exception:
         raise LoadGrammarError()
 
-    return Grammar(list(nonterminals), list(terminals), production_rules)
+    return Grammar(list(nonterminals), list(terminals), production_rules, precedences)
+
+
+def write_grammar(directory: str, content: str) -> str:
+    """
+        Write a CFG to a test.in file, e.g. in a temporary directory.
+
+    Args:
+        directory (str): Path to the directory of the file
+        content (str): The CFG, in the format read by load_grammar
+
+    Returns:
+        str: Path to the CFG file.
+    """
+    path = os.path.join(directory, 'test.in')
+    with open(path, 'w') as fout:
+        fout.write(content)
+
+    return path
+
+
+@pytest.mark.parametrize(
+    "content,precedences",
+    [
+        ('E->E + E|E * E|id\n', {}),
+        ('%left + -\n%left *\n%right ^\nE->E + E|E * E|E ^ E|id\n',
+         {
+             Terminal('+'): Precedence(1, Associativity.LEFT),
+             Terminal('-'): Precedence(1, Associativity.LEFT),
+             Terminal('*'): Precedence(2, Associativity.LEFT),
+             Terminal('^'): Precedence(3, Associativity.RIGHT)
+         }),
+        ('%nonassoc <\nE->E < E|id\n', {Terminal('<'): Precedence(1, Associativity.NONASSOC)}),
+        ('%prec +\nE->id\n', None),
+        ('%left\nE->id\n', None)
+    ]
+)
+def test__load_grammar__precedences__(content, precedences, tmp_path):
+    path = write_grammar(tmp_path, content)
+    if precedences is None:
+        with pytest.raises(LoadGrammarError):
+            load_grammar(path)
+
+        return
+
+    grammar = load_grammar(path)
+    assert grammar.precedences == precedences
+    assert grammar.start_symbol == Nonterminal('E')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
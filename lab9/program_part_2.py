@@ -2,15 +2,11 @@ import os
 
 from typing import List
 
-from grammar.utils import load_grammar
-from lab9.slr.filters import is_left_recursive, is_deterministic
-from lab9.slr.first_and_follow import FnF
-from lab9.grammar.grammar import Grammar
 from lab9.grammar.symbols.epsilon import Epsilon
 from lab9.grammar.symbols.nonterminal import Nonterminal
 from lab9.grammar.symbols.symbol import Symbol
 from lab9.grammar.symbols.terminal import Terminal
-from lab9.slr.slr import SLR
+from lab9.slr.table_cache import load_or_build
 
 
 def parse_line(sequence: str) -> List[Symbol]:
@@ -31,19 +27,9 @@ def parse_line(sequence: str) -> List[Symbol]:
 if __name__ == '__main__':
     grammar_path = os.path.join(os.getcwd(), 'grammars', 'assignment-test.in')
 
-    grammar: Grammar = load_grammar(grammar_path)
-    print(repr(grammar))
-
-    if not is_left_recursive(grammar):
-        raise RuntimeError('The given grammar is left recursive!')
-
-    if not is_deterministic(grammar):
-        raise RuntimeError('The given grammar is non-deterministic!')
-
-    fnf: FnF = FnF(grammar)
-    print(repr(fnf))
-
-    slr = SLR(grammar, fnf)
+    # The grammar is checked and the parsing table is built only if it is not in the cache.
+    slr = load_or_build(grammar_path)
+    print(repr(slr.grammar))
 
     menu = "\n\nSequence to be checked\n>> "
     while True:
@@ -52,5 +38,5 @@ if __name__ == '__main__':
             break
 
         parsed_symbols = parse_line(line)
-        result = slr.parse(parsed_symbols)
+        result = slr.parse(parsed_symbols, trace=True)
         print('\n'.join([str(r) for r in result]))
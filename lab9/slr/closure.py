@@ -1,5 +1,5 @@
 import random
-from typing import List
+from typing import List, FrozenSet, Tuple
 from uuid import uuid1, UUID
 
 import pytest
@@ -16,28 +16,43 @@ from lab9.slr.lr0item import LR0Item
 class Closure:
     """
     Class that represents a CFG closure. It is a collection of LR0 items
+    A closure is identified by its kernel, the items it was built from.
     """
 
     def __init__(self, grammar: Grammar, lr0items: List[LR0Item], closure_id: UUID = uuid1()):
         self.__grammar = grammar
-        self.__lr0items = lr0items
+        self.__lr0items = list(lr0items)
+        self.__kernel = Closure.get_kernel(grammar, lr0items)
         self.__apply_closure()
 
+    @staticmethod
+    def get_kernel(grammar: Grammar, lr0items: List[LR0Item]) -> FrozenSet[Tuple[int, int]]:
+        """
+        Get the canonical kernel of a collection of LR0 items, i.e. the set of (production rule index, dot index)
+        pairs. Production rules which are not part of the grammar (e.g. the augmented production) have index -1.
+        """
+        return frozenset(
+            (grammar.get_production_rule_index(item.production_rule), item.dot_index) for item in lr0items)
+
     def __apply_closure(self):
         def __apply_closure__(lr0item: LR0Item):
-            if lr0item in lr0items \
-                    or lr0item.is_final_item \
-                    or not isinstance(lr0item.current_symbol, Nonterminal):
+            if lr0item.is_final_item \
+                    or not isinstance(lr0item.current_symbol, Nonterminal) \
+                    or lr0item.current_symbol in expanded_nonterminals:
                 return
 
+            # Every nonterminal is expanded only once, this also stops on left recursive production rules.
+            expanded_nonterminals.add(lr0item.current_symbol)
             for pr in self.__grammar.get_production_rules_by_lhs_nonterminal(lr0item.current_symbol):
                 new_lr0item = LR0Item(pr)
-                if new_lr0item != lr0item:
-                    __apply_closure__(new_lr0item)
-                    if new_lr0item not in lr0items:
-                        lr0items.append(new_lr0item)
+                __apply_closure__(new_lr0item)
+                if new_lr0item not in found_lr0items:
+                    found_lr0items.add(new_lr0item)
+                    lr0items.append(new_lr0item)
 
         lr0items = []
+        found_lr0items = set()
+        expanded_nonterminals = set()
         for item in self.__lr0items:
             __apply_closure__(item)
 
@@ -47,10 +62,15 @@ class Closure:
     def lr0items(self) -> List[LR0Item]:
         return self.__lr0items
 
+    @property
+    def kernel(self) -> FrozenSet[Tuple[int, int]]:
+        return self.__kernel
+
     @property
     def is_final_closure(self) -> bool:
+        epsilon = Epsilon()
         for lr0item in self.__lr0items:
-            if not (lr0item.is_final_item or lr0item.current_symbol == Epsilon()):
+            if not (lr0item.is_final_item or lr0item.current_symbol is epsilon):
                 return False
 
         return True
@@ -65,13 +85,13 @@ class Closure:
         return i
 
     def __eq__(self, other) -> bool:
-        return isinstance(other, Closure) and self.__dict__ == other.__dict__
+        return isinstance(other, Closure) and self.__grammar is other.__grammar and self.__kernel == other.__kernel
 
     def __ne__(self, other) -> bool:
         return not self.__eq__(other)
 
     def __hash__(self) -> int:
-        return sum([hash(item) for item in self.__lr0items])
+        return hash(self.__kernel)
 
     def __repr__(self):
         return '\n'.join([repr(item) for item in self.__lr0items])
@@ -0,0 +1,192 @@
+from array import array
+from collections import Counter
+from typing import List, Dict, Union, Callable
+
+import pytest
+
+IntArray = Union[array, memoryview]
+
+
+class CompressedTable:
+    """
+    Class that represents a parsing table compressed by row displacement (a comb vector). The explicit cells of every
+    row are laid over one shared vector, at an offset (base) chosen so that they don't overlap the cells of the other
+    rows. A check vector remembers the row which owns every slot, so a lookup is still O(1):
+        slot = bases[row] + column
+        action = values[slot] if checks[slot] == row else defaults[row]
+    Every row also has a default action, the reduction which is most common on its terminals. Its cells are not
+    stored, so most rows only keep their shifts and gotos. The cells which must stay errors although the row has a
+    default (e.g. %nonassoc) are stored explicitly as 0.
+    """
+
+    def __init__(self, rows_count: int, columns_count: int, defaults: IntArray, bases: IntArray, checks: IntArray,
+                 values: IntArray):
+        """
+        Args:
+            rows_count (int): the number of rows (closures)
+            columns_count (int): the number of columns (symbols)
+            defaults (IntArray): the default action of every row, 0 for none
+            bases (IntArray): the offset of every row in the comb vector
+            checks (IntArray): the row which owns every slot of the comb vector, -1 for a free slot
+            values (IntArray): the action in every slot of the comb vector
+        """
+        self.__rows_count = rows_count
+        self.__columns_count = columns_count
+        self.__defaults = defaults
+        self.__bases = bases
+        self.__checks = checks
+        self.__values = values
+
+    @staticmethod
+    def compress(rows: List[Dict[int, int]], columns_count: int, default_columns_count: int,
+                 is_default: Callable[[int], bool] = lambda action: action != 0) -> 'CompressedTable':
+        """
+        Compress a sparse parsing table. The rows are placed greedily, the fullest first, at the lowest base where
+        their cells fit.
+
+        Args:
+            rows (List[Dict[int, int]]): the explicit cells of every row, column => action (0 for an explicit error)
+            columns_count (int): the number of columns
+            default_columns_count (int): only the first columns (the terminals and $) may use the default action
+            is_default (Callable[[int], bool], optional): the actions which may be a default. Defaults to any non
+            error action.
+
+        Returns:
+            CompressedTable: the compressed table
+        """
+        defaults = array('i', [0]) * len(rows)
+        cells: List[Dict[int, int]] = []
+        for row, columns in enumerate(rows):
+            counter = Counter(action for column, action in columns.items()
+                              if column < default_columns_count and is_default(action))
+            if len(counter) > 0:
+                defaults[row] = max(counter, key=lambda action: (counter[action], -action))
+
+            cells.append({column: action for column, action in columns.items()
+                          if column >= default_columns_count or action != defaults[row]})
+
+        bases = array('i', [0]) * len(rows)
+        checks = array('i')
+        values = array('i')
+        # The lowest slot which may still be free, every base before it minus the first column is taken
+        first_free = 0
+        for row in sorted(range(len(rows)), key=lambda row: -len(cells[row])):
+            columns = sorted(cells[row])
+            if len(columns) == 0:
+                continue
+
+            base = max(first_free - columns[0], 0)
+            while any(base + column < len(checks) and checks[base + column] != -1 for column in columns):
+                base += 1
+
+            bases[row] = base
+            required = base + columns[-1] + 1
+            if required > len(checks):
+                checks.extend([-1] * (required - len(checks)))
+                values.extend([0] * (required - len(values)))
+
+            for column in columns:
+                checks[base + column] = row
+                values[base + column] = cells[row][column]
+
+            while first_free < len(checks) and checks[first_free] != -1:
+                first_free += 1
+
+        # Every base + column must be inside the vectors
+        padding = max(bases, default=0) + columns_count - len(checks)
+        if padding > 0:
+            checks.extend([-1] * padding)
+            values.extend([0] * padding)
+
+        return CompressedTable(len(rows), columns_count, defaults, bases, checks, values)
+
+    # region Getters and Setters
+
+    @property
+    def rows_count(self) -> int:
+        return self.__rows_count
+
+    @property
+    def columns_count(self) -> int:
+        return self.__columns_count
+
+    @property
+    def defaults(self) -> IntArray:
+        return self.__defaults
+
+    @property
+    def bases(self) -> IntArray:
+        return self.__bases
+
+    @property
+    def checks(self) -> IntArray:
+        return self.__checks
+
+    @property
+    def values(self) -> IntArray:
+        return self.__values
+
+    @property
+    def nbytes(self) -> int:
+        return sum(vector.itemsize * len(vector)
+                   for vector in (self.__defaults, self.__bases, self.__checks, self.__values))
+
+    # endregion
+
+    def get(self, row: int, column: int) -> int:
+        """
+        Get the encoded action of a cell.
+        """
+        slot = self.__bases[row] + column
+        if self.__checks[slot] == row:
+            return self.__values[slot]
+
+        return self.__defaults[row]
+
+    def to_dense(self) -> List[int]:
+        """
+        Get all the cells, row by row, with the default actions filled in.
+        """
+        return [self.get(row, column) for row in range(self.__rows_count) for column in range(self.__columns_count)]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CompressedTable) and self.__rows_count == other.__rows_count and \
+               self.__columns_count == other.__columns_count and self.to_dense() == other.to_dense()
+
+    def __ne__(self, other) -> bool:
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return f"{self.__rows_count}x{self.__columns_count} in {len(self.__checks)} slots"
+
+    def __str__(self):
+        return repr(self)
+
+
+@pytest.mark.parametrize(
+    "rows,columns_count,default_columns_count",
+    [
+        ([{0: 9, 2: 17}, {0: 10, 1: 10, 3: 25}, {}, {1: 0, 2: 10, 3: 33}], 4, 2),
+        ([{column: 10 for column in range(5)}, {4: 9}, {0: 9, 4: 17}], 5, 5),
+        ([{}, {}], 3, 3)
+    ]
+)
+def test__compress__(rows, columns_count, default_columns_count):
+    table = CompressedTable.compress(rows, columns_count, default_columns_count)
+    assert table.rows_count == len(rows)
+    for row, columns in enumerate(rows):
+        default = table.defaults[row]
+        assert default == 0 or default in columns.values()
+        # The columns after the default ones are only read where they have a cell (the gotos)
+        for column in range(columns_count):
+            if column < default_columns_count or column in columns:
+                assert table.get(row, column) == columns.get(column, default)
+
+    # The cells of different rows never share a slot
+    owned = [(table.bases[row] + column, row) for row, columns in enumerate(rows) for column in columns
+             if table.checks[table.bases[row] + column] == row]
+    assert len(owned) == len(set(slot for slot, _ in owned))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,57 @@
+from typing import List, Callable
+
+from lab9.grammar.symbols.symbol import Symbol
+from lab9.grammar.symbols.terminal import Terminal
+
+# The pseudo terminal of the error production rules, like in yacc: STATEMENT->error ;
+ERROR_TERMINAL = Terminal('error')
+
+
+class Diagnostic:
+    """
+    Class that represents a syntax error found by a parse: the position of the terminal in the buffer, the closure
+    on top of the stack and the terminal. The expected terminals are only computed when they are read.
+    """
+
+    def __init__(self, position: int, state: int, symbol: Symbol, get_expected: Callable[[int], List[Symbol]]):
+        """
+        Args:
+            position (int): the position of the terminal in the buffer (the length of the buffer for $)
+            state (int): the index of the closure on top of the stack
+            symbol (Symbol): the terminal
+            get_expected (Callable[[int], List[Symbol]]): the terminals which have an action in a closure
+        """
+        self.__position = position
+        self.__state = state
+        self.__symbol = symbol
+        self.__get_expected = get_expected
+        self.__expected: List[Symbol] = None
+
+    # region Getters and Setters
+
+    @property
+    def position(self) -> int:
+        return self.__position
+
+    @property
+    def state(self) -> int:
+        return self.__state
+
+    @property
+    def symbol(self) -> Symbol:
+        return self.__symbol
+
+    @property
+    def expected(self) -> List[Symbol]:
+        if self.__expected is None:
+            self.__expected = self.__get_expected(self.__state)
+
+        return self.__expected
+
+    # endregion
+
+    def __repr__(self):
+        return f"ERROR: no action found at index {self.__state} with {self.__symbol}."
+
+    def __str__(self):
+        return repr(self)
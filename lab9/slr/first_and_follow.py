@@ -1,4 +1,5 @@
-from typing import Dict, Set
+from collections import deque
+from typing import Dict, Set, List, Tuple
 
 import pytest
 
@@ -9,128 +10,166 @@ from lab9.grammar.symbols.epsilon import Epsilon
 from lab9.grammar.symbols.nonterminal import Nonterminal
 from lab9.grammar.symbols.symbol import Symbol
 from lab9.grammar.symbols.terminal import Terminal
+from lab9.slr.terminal_set import TerminalSet
 
 
 class FnF:
     """
-        Class that represents a context-free grammar (CFG).
+        Class that represents the FIRST and FOLLOW sets of a context-free grammar (CFG).
+        The sets are computed as fixed points with worklists over integer ids: every nonterminal and terminal is
+        numbered, a set of terminals is an int bitset and the nullable nonterminals are a vector of flags.
     """
 
     def __init__(self, grammar: Grammar):
         self.__grammar = grammar
         self.__first: Dict[Nonterminal, Set[Symbol]] = {}
         self.__follow: Dict[Nonterminal, Set[Symbol]] = {}
+        self.__number_symbols()
+        self.__compute_nullable()
         self.__compute_first()
         self.__compute_follow()
 
+    def __number_symbols(self):
+        """
+            Number the nonterminals and the terminals ($ is the last terminal) and encode the production rules as
+            (lhs id, rhs codes), a nonterminal is coded by its id and a terminal t by ~t. Epsilon is dropped.
+        """
+
+        production_rules = self.__grammar.production_rules
+        nonterminals = dict.fromkeys(self.__grammar.nonterminals)
+        terminals = dict.fromkeys(self.__grammar.terminals)
+        for production_rule in production_rules:
+            nonterminals[production_rule.lhs] = None
+            for symbol in production_rule.rhs:
+                if isinstance(symbol, Nonterminal):
+                    nonterminals[symbol] = None
+                elif isinstance(symbol, Terminal):
+                    terminals[symbol] = None
+
+        terminals[Dollar()] = None
+        self.__nonterminals: List[Nonterminal] = list(nonterminals)
+        self.__nonterminal_ids = {nonterminal: index for index, nonterminal in enumerate(self.__nonterminals)}
+        self.__empty_set = TerminalSet.numbering(terminals)
+        nonterminal_ids = self.__nonterminal_ids
+        terminal_ids = {terminal: self.__empty_set.get_id(terminal) for terminal in terminals}
+        self.__production_rules: List[Tuple[int, List[int]]] = [
+            (nonterminal_ids[production_rule.lhs],
+             [nonterminal_ids[symbol] if isinstance(symbol, Nonterminal) else ~terminal_ids[symbol]
+              for symbol in production_rule.rhs if not isinstance(symbol, Epsilon)])
+            for production_rule in production_rules]
+
+    def __compute_nullable(self):
+        """
+            A nonterminal is nullable once all the rhs symbols of one of its production rules are nullable. Each rule
+            counts its symbols which are not known to be nullable yet, so every rhs occurrence is visited once.
+        """
+
+        self.__nullable = bytearray(len(self.__nonterminals))
+        remaining = []
+        occurrences: List[List[int]] = [[] for _ in self.__nonterminals]
+        worklist = deque()
+        for production_rule_index, (lhs, rhs) in enumerate(self.__production_rules):
+            if any(code < 0 for code in rhs):
+                remaining.append(-1)  # A terminal is never nullable.
+                continue
+
+            remaining.append(len(rhs))
+            for code in rhs:
+                occurrences[code].append(production_rule_index)
+
+            if len(rhs) == 0 and not self.__nullable[lhs]:
+                self.__nullable[lhs] = 1
+                worklist.append(lhs)
+
+        while len(worklist) > 0:
+            nonterminal = worklist.popleft()
+            for production_rule_index in occurrences[nonterminal]:
+                remaining[production_rule_index] -= 1
+                lhs = self.__production_rules[production_rule_index][0]
+                if remaining[production_rule_index] == 0 and not self.__nullable[lhs]:
+                    self.__nullable[lhs] = 1
+                    worklist.append(lhs)
+
+    @staticmethod
+    def __propagate(bits: List[int], edges: List[List[int]]):
+        """
+            Make bits[to] include bits[from] for every edge, until nothing changes.
+        """
+
+        worklist = deque(range(len(bits)))
+        queued = bytearray([1]) * len(bits)
+        while len(worklist) > 0:
+            from_id = worklist.popleft()
+            queued[from_id] = 0
+            from_bits = bits[from_id]
+            for to_id in edges[from_id]:
+                if from_bits & ~bits[to_id]:
+                    bits[to_id] |= from_bits
+                    if not queued[to_id]:
+                        queued[to_id] = 1
+                        worklist.append(to_id)
+
     def __compute_first(self):
-        def __compute_first__(nt: Nonterminal):
-            if nt in computed_already:
-                return
-
-            nt_first = set()
-            for pr in self.__grammar.get_production_rules_by_lhs_nonterminal(nt):
-                for symbol in pr.rhs:
-                    if isinstance(symbol, Epsilon) or isinstance(symbol, Terminal):
-                        nt_first.add(symbol)
-                        break
-                    elif isinstance(symbol, Nonterminal) and symbol != nt:
-                        if symbol not in computed_already:
-                            __compute_first__(symbol)
-
-                        s_first = self.get_first_of_nonterminal(symbol).copy()
-                        if epsilon not in s_first:
-                            nt_first = nt_first.union(s_first)
-                            break
-                        else:
-                            s_first.remove(epsilon)
-                            nt_first = nt_first.union(s_first)
-                            if symbol == pr.rhs[-1]:
-                                if pr.lhs not in computed_already and pr.lhs != nt:
-                                    __compute_first__(pr.lhs)
-
-                                lhs_first = self.get_first_of_nonterminal(pr.lhs).copy()
-                                if len(lhs_first) == 0:
-                                    nt_first.add(Epsilon())
-                                else:
-                                    nt_first = nt_first.union(lhs_first)
-
-            computed_already.add(nt)
-            self.__first[nt] = nt_first
+        """
+            FIRST(A) gets every terminal which starts a rhs of A and FIRST(B) for every B which starts a rhs of A
+            after nullable nonterminals.
+        """
+
+        first_bits = [0] * len(self.__nonterminals)
+        edges: List[List[int]] = [[] for _ in self.__nonterminals]
+        for lhs, rhs in self.__production_rules:
+            for code in rhs:
+                if code < 0:
+                    first_bits[lhs] |= 1 << ~code
+                    break
+
+                edges[code].append(lhs)
+                if not self.__nullable[code]:
+                    break
+
+        FnF.__propagate(first_bits, edges)
+        self.__first_bits = first_bits
 
         epsilon = Epsilon()
-        computed_already = set()
-        for nonterminal in self.__grammar.nonterminals:
-            __compute_first__(nonterminal)
+        for nonterminal_id, nonterminal in enumerate(self.__nonterminals):
+            first = set(self.__empty_set.from_bits(first_bits[nonterminal_id]))
+            if self.__nullable[nonterminal_id]:
+                first.add(epsilon)
 
-    def __compute_follow(self):
-        def __split_rhs_by_duplicate_nonterminal__(pr: ProductionRule, nt: Nonterminal):
-            counter = 0
-            for s in pr.rhs:
-                if s == nt:
-                    counter += 1
-
-            if counter == 1:
-                return [pr]
-
-            prs = []
-            rhs = []
-            for i in range(len(pr.rhs) - 1, -1, -1):
-                rhs.insert(0, pr.rhs[i])
-                if pr.rhs[i] == nt:
-                    prs.append(ProductionRule(pr.lhs, rhs[:]))
-
-            return prs
-
-        def __compute_follow__(nt: Nonterminal):
-            if nt in computed_already:
-                return
-
-            nt_follow = self.get_follow_of_nonterminal(nt)  # $ is added beforehand
-            for pr in self.__grammar.get_production_rules_by_rhs_nonterminal(nt):
-                for __pr__ in __split_rhs_by_duplicate_nonterminal__(pr, nt):
-                    found_nt = False
-                    rhs = []
-                    for symbol in __pr__.rhs:
-                        if found_nt:
-                            rhs.append(symbol)
-
-                        if symbol == nt:
-                            found_nt = True
-
-                    check_lhs = True
-                    for symbol in rhs:
-                        if isinstance(symbol, Terminal):
-                            nt_follow.add(symbol)
-                            check_lhs = False
-                            break
-                        elif isinstance(symbol, Nonterminal):
-                            s_first = self.get_first_of_nonterminal(symbol).copy()
-                            if epsilon not in s_first:
-                                nt_follow = nt_follow.union(s_first)
-                                if symbol != rhs[-1]:
-                                    check_lhs = False
-                                    break
-                            else:
-                                s_first.remove(epsilon)
-                                nt_follow = nt_follow.union(s_first)
-                                check_lhs = True
-
-                    if check_lhs:
-                        if __pr__.lhs not in computed_already and __pr__.lhs != nt:
-                            __compute_follow__(__pr__.lhs)
-
-                        lhs_follow = self.get_follow_of_nonterminal(__pr__.lhs).copy()
-                        nt_follow = nt_follow.union(lhs_follow)
-
-            computed_already.add(nt)
-            self.__follow[nt] = nt_follow
+            self.__first[nonterminal] = first
 
-        epsilon = Epsilon()
-        computed_already = set()
-        self.__follow[self.__grammar.start_symbol] = {Dollar()}
-        for nonterminal in self.__grammar.nonterminals:
-            __compute_follow__(nonterminal)
+    def __compute_follow(self):
+        """
+            FOLLOW(B) gets FIRST of what comes after B in a rhs of A and, if that is nullable, FOLLOW(A).
+            The start symbol is followed by $.
+        """
+
+        follow_bits = [0] * len(self.__nonterminals)
+        edges: List[List[int]] = [[] for _ in self.__nonterminals]
+        follow_bits[self.__nonterminal_ids[self.__grammar.start_symbol]] = 1 << self.__empty_set.get_id(Dollar())
+        for lhs, rhs in self.__production_rules:
+            trailer_bits = 0
+            trailer_nullable = True
+            for code in reversed(rhs):
+                if code < 0:
+                    trailer_bits = 1 << ~code
+                    trailer_nullable = False
+                    continue
+
+                follow_bits[code] |= trailer_bits
+                if trailer_nullable and code != lhs:
+                    edges[lhs].append(code)
+
+                if self.__nullable[code]:
+                    trailer_bits |= self.__first_bits[code]
+                else:
+                    trailer_bits = self.__first_bits[code]
+                    trailer_nullable = False
+
+        FnF.__propagate(follow_bits, edges)
+        self.__follow_bits = follow_bits
+        for nonterminal_id, nonterminal in enumerate(self.__nonterminals):
+            self.__follow[nonterminal] = set(self.__empty_set.from_bits(follow_bits[nonterminal_id]))
 
     # region Getters
 
@@ -164,6 +203,28 @@ class FnF:
 
         return set()
 
+    def is_nullable(self, nonterminal: Nonterminal) -> bool:
+        nonterminal_id = self.__nonterminal_ids.get(nonterminal)
+        return nonterminal_id is not None and self.__nullable[nonterminal_id] == 1
+
+    def get_first_bits(self, nonterminal: Nonterminal) -> TerminalSet:
+        """
+            Get the FIRST set of a nonterminal as a bitset, without epsilon (see is_nullable).
+            All the bitsets of a FnF share the same numbering of the terminals, $ included.
+        """
+        nonterminal_id = self.__nonterminal_ids.get(nonterminal)
+        return self.__empty_set.from_bits(0 if nonterminal_id is None else self.__first_bits[nonterminal_id])
+
+    def get_follow_bits(self, nonterminal: Nonterminal) -> TerminalSet:
+        """
+            Get the FOLLOW set of a nonterminal as a bitset.
+        """
+        nonterminal_id = self.__nonterminal_ids.get(nonterminal)
+        return self.__empty_set.from_bits(0 if nonterminal_id is None else self.__follow_bits[nonterminal_id])
+
+    def get_empty_bits(self) -> TerminalSet:
+        return self.__empty_set
+
 
 @pytest.mark.parametrize(
     "grammar,first,follow",
@@ -586,6 +647,11 @@ class FnF:
 def test__fnf__(grammar, first, follow):
     fnf = FnF(grammar)
     assert fnf.first == first and fnf.follow == follow
+    epsilon = Epsilon()
+    for nonterminal in first:
+        assert fnf.get_first_bits(nonterminal) == first[nonterminal] - {epsilon}
+        assert fnf.is_nullable(nonterminal) == (epsilon in first[nonterminal])
+        assert fnf.get_follow_bits(nonterminal) == follow[nonterminal]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,382 @@
+from itertools import chain
+from typing import List, Tuple, Iterable, Optional
+from weakref import WeakValueDictionary
+
+import pytest
+
+from lab9.grammar.grammar import Grammar
+from lab9.grammar.production_rule import ProductionRule
+from lab9.grammar.symbols.dollar import Dollar
+from lab9.grammar.symbols.nonterminal import Nonterminal
+from lab9.grammar.symbols.symbol import Symbol
+from lab9.grammar.symbols.terminal import Terminal
+from lab9.slr.diagnostic import Diagnostic
+from lab9.slr.parse_observer import ParseObserver
+from lab9.slr.parse_tree import ParseTree, ParseTreeBuilder
+from lab9.slr.slr import SLR, ParsingError, ParsingTableAction, ParsingTableActionState
+
+
+class StackNode:
+    """
+    Class that represents a persistent parser stack: the closure index on top and the rest of the stack. Nodes are
+    hash consed by the IncrementalParser, so two stacks are equal only if they are the same node.
+    """
+
+    __slots__ = ('__state', '__parent', '__weakref__')
+
+    def __init__(self, state: int, parent: Optional['StackNode']):
+        self.__state = state
+        self.__parent = parent
+
+    # region Getters and Setters
+
+    @property
+    def state(self) -> int:
+        return self.__state
+
+    @property
+    def parent(self) -> Optional['StackNode']:
+        return self.__parent
+
+    # endregion
+
+    def __repr__(self):
+        states = []
+        node = self
+        while node is not None:
+            states.append(node.__state)
+            node = node.__parent
+
+        return repr(states[::-1])
+
+    def __str__(self):
+        return repr(self)
+
+
+class IncrementalParser:
+    """
+    Class that keeps a parse of a buffer up to date while the buffer is edited. For every position of the buffer it
+    keeps the stack before the terminal at that position was looked at and the reductions made with that terminal as
+    lookahead. The stack before a position only depends on the terminals before it, so after an edit the parse
+    resumes from the stack at the start of the edit. Once the edit is shifted, the parse stops as soon as the stack
+    is the same node as the old stack at the same terminal: everything after it is the same as before and the old
+    snapshots and reductions are reused. The work is proportional to the edit and to the reductions which cross it,
+    not to the buffer.
+    """
+
+    def __init__(self, slr: SLR):
+        """
+        Args:
+            slr (SLR): the parser, any builder (e.g. LALR) or a parser loaded from the table cache
+        """
+        self.__slr = slr
+        self.__nodes: WeakValueDictionary = WeakValueDictionary()
+        self.__root = self.__push(0, None)  # Start from the first closure.
+        self.__tokens: List[Symbol] = []
+        # snapshots[position] = the stack before the terminal at position is looked at
+        self.__snapshots: List[StackNode] = [self.__root]
+        # reductions[position] = (from index, production rule index, goto from index, goto to index) of every
+        # reduction made with the terminal at position as lookahead
+        self.__reductions: List[List[Tuple[int, int, int, int]]] = []
+        self.__error_position: Optional[int] = None
+        self.__parsed_count = 0
+
+    # region Getters and Setters
+
+    @property
+    def tokens(self) -> List[Symbol]:
+        return self.__tokens
+
+    @property
+    def parsed_count(self) -> int:
+        """
+        The number of terminals looked at by the last parse or edit.
+        """
+        return self.__parsed_count
+
+    @property
+    def reductions(self) -> List[int]:
+        """
+        The indexes of the production rules used for reductions, in order, like SLR.parse returns them.
+        """
+        return [reduction[1] for reduction in chain.from_iterable(self.__reductions)]
+
+    # endregion
+
+    def __push(self, state: int, parent: Optional[StackNode]) -> StackNode:
+        key = (state, parent)
+        node = self.__nodes.get(key)
+        if node is None:
+            node = self.__nodes[key] = StackNode(state, parent)
+
+        return node
+
+    def parse(self, buffer: Iterable[Symbol]) -> List[int]:
+        """
+        Parse a whole buffer, forgetting the previous one.
+
+        Raises:
+            ParsingError: if the buffer is not accepted, the parse can still be fixed by an edit
+
+        Returns:
+            List[int]: the indexes of the production rules used for reductions, in order
+        """
+        self.__tokens = list(buffer)
+        self.__snapshots = [self.__root]
+        self.__reductions = []
+        self.__error_position = None
+        return self.__run(0, [], [], None, len(self.__tokens) + 1, 0)
+
+    def edit(self, start: int, end: int, new_tokens: Iterable[Symbol]) -> List[int]:
+        """
+        Replace the terminals between start and end (exclusive) and parse again only what the edit changes.
+
+        Args:
+            start (int): the position of the first replaced terminal
+            end (int): the position after the last replaced terminal, start for an insertion
+            new_tokens (Iterable[Symbol]): the new terminals, empty for a deletion
+
+        Raises:
+            IndexError: if the range is not inside the buffer
+            ParsingError: if the edited buffer is not accepted, the parse can still be fixed by another edit
+
+        Returns:
+            List[int]: the indexes of the production rules used for reductions, in order
+        """
+        if not 0 <= start <= end <= len(self.__tokens):
+            raise IndexError(f'Bad edit range [{start}, {end}) for {len(self.__tokens)} terminals.')
+
+        new_tokens = list(new_tokens)
+        self.__tokens[start:end] = new_tokens
+
+        # A failed parse has no snapshots after its error, it resumes from there
+        resume = min(start, len(self.__snapshots) - 1)
+        old_snapshots = self.__snapshots
+        old_reductions = self.__reductions
+        old_error_position = self.__error_position
+        self.__snapshots = old_snapshots[:resume + 1]
+        self.__reductions = old_reductions[:resume]
+        self.__error_position = None
+        return self.__run(resume, old_snapshots, old_reductions, old_error_position, start + len(new_tokens),
+                          len(new_tokens) - (end - start))
+
+    def __run(self, position: int, old_snapshots: List[StackNode],
+              old_reductions: List[List[Tuple[int, int, int, int]]], old_error_position: Optional[int],
+              sync_position: int, delta: int) -> List[int]:
+        """
+        Parse from a position with its snapshot, until the end or until the stack is the same as the old stack at
+        the same terminal.
+
+        Args:
+            position (int): the position to resume from, its snapshot is already kept
+            old_snapshots (List[StackNode]): the snapshots before the edit
+            old_reductions (List[List[Tuple[int, int, int, int]]]): the reductions before the edit
+            old_error_position (Optional[int]): the position of the error before the edit, None if it was accepted
+            sync_position (int): the first position after the edit
+            delta (int): the old position of a terminal after the edit is its new position - delta
+        """
+        table = self.__slr.parsing_table
+        symbol_indexes = self.__slr.symbol_indexes
+        reductions_info = self.__slr.reductions
+        state_bits = ParsingTableAction.STATE_BITS
+        state_mask = ParsingTableAction.STATE_MASK
+        shift = ParsingTableActionState.SHIFT.value
+        reduce = ParsingTableActionState.REDUCE.value
+        accept = ParsingTableActionState.ACCEPT.value
+        node = self.__snapshots[position]
+        self.__parsed_count = 0
+        while True:
+            if position >= sync_position:
+                old_position = position - delta
+                if old_position < len(old_snapshots) and old_snapshots[old_position] is node:
+                    self.__snapshots.extend(old_snapshots[old_position + 1:])
+                    self.__reductions.extend(old_reductions[old_position:])
+                    if old_error_position is not None:
+                        self.__error_position = old_error_position + delta
+
+                    break
+
+            self.__parsed_count += 1
+            symbol_index = symbol_indexes.get(self.__get_symbol(position), -1)
+            reductions: List[Tuple[int, int, int, int]] = []
+            self.__reductions.append(reductions)
+            while True:
+                action = 0 if symbol_index == -1 else table.get(node.state, symbol_index)
+                action_state = action & state_mask
+                if action_state == shift:
+                    node = self.__push(action >> state_bits, node)
+                    break
+
+                if action_state == reduce:
+                    from_index = node.state
+                    production_rule_index = action >> state_bits
+                    lhs_index, pop_count = reductions_info[production_rule_index]
+                    for _ in range(pop_count):
+                        node = node.parent
+
+                    to_index = table.get(node.state, lhs_index) >> state_bits
+                    reductions.append((from_index, production_rule_index, node.state, to_index))
+                    node = self.__push(to_index, node)
+                    continue
+
+                if action_state != accept:
+                    self.__error_position = position
+
+                break
+
+            if action_state != shift:
+                break
+
+            position += 1
+            self.__snapshots.append(node)
+
+        if self.__error_position is not None:
+            raise self.__get_error()
+
+        return self.reductions
+
+    def __get_error(self) -> ParsingError:
+        diagnostic = Diagnostic(self.__error_position, self.__get_top_state(self.__error_position),
+                                self.__get_symbol(self.__error_position), self.__slr.get_expected_terminals)
+        return ParsingError([], repr(diagnostic), diagnostic)
+
+    def __get_symbol(self, position: int) -> Symbol:
+        return self.__tokens[position] if position < len(self.__tokens) else Dollar()
+
+    def __get_top_state(self, position: int) -> int:
+        """
+        Get the closure index on top of the stack after the reductions at a position.
+        """
+        reductions = self.__reductions[position]
+        return reductions[-1][3] if len(reductions) > 0 else self.__snapshots[position].state
+
+    def replay(self, observer: ParseObserver):
+        """
+        Send the steps of the current parse to an observer, without parsing again.
+
+        Raises:
+            ParsingError: if the buffer is not accepted
+        """
+        production_rules = self.__slr.grammar.production_rules
+        for position, reductions in enumerate(self.__reductions):
+            for from_index, production_rule_index, goto_from_index, to_index in reductions:
+                observer.on_reduce(from_index, production_rule_index, production_rules[production_rule_index],
+                                   self.__slr.reductions[production_rule_index][1])
+                observer.on_goto(goto_from_index, to_index, production_rules[production_rule_index].lhs)
+
+            from_index = self.__get_top_state(position)
+            if position == self.__error_position:
+                observer.on_error(from_index, self.__get_symbol(position), position)
+                raise self.__get_error()
+
+            if position == len(self.__tokens):
+                observer.on_accept(from_index, Dollar())
+            else:
+                observer.on_shift(from_index, self.__snapshots[position + 1].state, self.__tokens[position], position)
+
+    def parse_tree(self) -> ParseTree:
+        """
+        Build the parse tree of the current parse from the kept reductions.
+
+        Raises:
+            ParsingError: if the buffer is not accepted
+
+        Returns:
+            ParseTree: the parse tree, its root is the start symbol
+        """
+        builder = ParseTreeBuilder(self.__slr.grammar)
+        self.replay(builder)
+        return builder.tree
+
+
+def __get_test_grammar__() -> Grammar:
+    # L->L ; E | E, E->( E ) | i
+    return Grammar(
+        [
+            Nonterminal('L'),
+            Nonterminal('E')
+        ],
+        [
+            Terminal(';'),
+            Terminal('('),
+            Terminal(')'),
+            Terminal('i')
+        ],
+        [
+            ProductionRule(Nonterminal('L'),
+                           [
+                               Nonterminal('L'),
+                               Terminal(';'),
+                               Nonterminal('E')
+                           ]),
+            ProductionRule(Nonterminal('L'),
+                           [
+                               Nonterminal('E')
+                           ]),
+            ProductionRule(Nonterminal('E'),
+                           [
+                               Terminal('('),
+                               Nonterminal('E'),
+                               Terminal(')')
+                           ]),
+            ProductionRule(Nonterminal('E'),
+                           [
+                               Terminal('i')
+                           ])
+        ])
+
+
+@pytest.mark.parametrize(
+    "sequence,edits",
+    [
+        ('i ; i ; i ; i ; i ; i', [(4, 5, '( i )'), (4, 7, 'i'), (0, 0, 'i ;'), (12, 13, '')]),
+        ('i ; i', [(1, 1, ')'), (1, 2, ''), (3, 3, '; ( ( i ) )')]),
+        ('( i', [(2, 2, ')'), (0, 3, 'i ; i')]),
+        ('i ; ( i ) ; i', [(3, 4, '( ( i ) )'), (0, 10, '')])
+    ]
+)
+def test__edit__(sequence, edits):
+    from lab9.slr.first_and_follow import FnF
+
+    def __parse__(function, *args):
+        try:
+            return function(*args)
+        except ParsingError:
+            return None
+
+    def __to_terminals__(text: str) -> List[Symbol]:
+        return [Terminal(symbol) for symbol in text.split(' ') if symbol != '']
+
+    grammar = __get_test_grammar__()
+    slr = SLR(grammar, FnF(grammar))
+    parser = IncrementalParser(slr)
+    tokens = __to_terminals__(sequence)
+    assert __parse__(parser.parse, tokens) == __parse__(slr.parse, tokens)
+    for start, end, text in edits:
+        tokens[start:end] = __to_terminals__(text)
+        result = __parse__(parser.edit, start, end, __to_terminals__(text))
+        assert parser.tokens == tokens
+        assert result == __parse__(slr.parse, tokens)
+        if result is not None:
+            assert repr(parser.parse_tree()) == repr(slr.parse_tree(tokens))
+
+
+def test__edit__cost__():
+    from lab9.slr.first_and_follow import FnF
+
+    grammar = __get_test_grammar__()
+    slr = SLR(grammar, FnF(grammar))
+    parser = IncrementalParser(slr)
+    tokens = [Terminal('i'), Terminal(';')] * 1000 + [Terminal('i')]
+    parser.parse(tokens)
+    assert parser.parsed_count == len(tokens) + 1
+
+    # Only the edit and the terminal after it are looked at again
+    new_tokens = [Terminal('('), Terminal('i'), Terminal(')')]
+    tokens[1000:1001] = new_tokens
+    assert parser.edit(1000, 1001, new_tokens) == slr.parse(tokens)
+    assert parser.parsed_count == len(new_tokens) + 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
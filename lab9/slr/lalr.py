@@ -0,0 +1,241 @@
+from typing import List, Dict, Tuple
+
+import pytest
+
+from lab9.grammar.grammar import Grammar
+from lab9.grammar.production_rule import ProductionRule
+from lab9.grammar.symbols.dollar import Dollar
+from lab9.grammar.symbols.epsilon import Epsilon
+from lab9.grammar.symbols.nonterminal import Nonterminal
+from lab9.grammar.symbols.terminal import Terminal
+from lab9.grammar.utils import load_grammar, write_grammar
+from lab9.slr.first_and_follow import FnF
+from lab9.slr.lr0item import LR0Item
+from lab9.slr.slr import SLR, ParsingError, ShiftReduceConflict, ReduceReduceConflict
+from lab9.slr.terminal_set import TerminalSet
+
+
+class LALR(SLR):
+    """
+    Class that represents a LALR(1) parser. It has the same canonical collection and parsing table format as SLR,
+    only the lookaheads of the reductions are more precise. They are computed with the DeRemer-Pennello relations
+    over the nonterminal transitions (p, A) of the LR(0) automaton:
+        DR(p, A) = the terminals shifted from goto(p, A) ($ for the start symbol from the first closure)
+        (p, A) reads (r, C) if r = goto(p, A) and C is nullable
+        (p, A) includes (p', B) if B->x A y, y is nullable and p' reaches p with x
+        (q, A->w) lookback (p, A) if p reaches q with w
+    Read is DR closed under reads, Follow is Read closed under includes and the lookaheads of a reduction are the
+    union of the Follow sets it looks back to. Both closures are computed with the SCC based digraph algorithm.
+    """
+
+    def __init__(self, grammar: Grammar, fnf: FnF):
+        # (closure index, production rule index) => lookahead bits
+        self.__lookaheads: Dict[Tuple[int, int], int] = {}
+        super().__init__(grammar, fnf)
+
+    def _build_lookaheads(self):
+        epsilon = Epsilon()
+        empty_set = self._fnf.get_empty_bits()
+
+        # Number the nonterminal transitions
+        transitions: List[Tuple[int, Nonterminal]] = []
+        transition_ids: Dict[Tuple[int, Nonterminal], int] = {}
+        for from_index, goto in enumerate(self._goto):
+            for symbol in goto:
+                if isinstance(symbol, Nonterminal):
+                    transition_ids[(from_index, symbol)] = len(transitions)
+                    transitions.append((from_index, symbol))
+
+        # Direct reads and reads
+        read_bits = [0] * len(transitions)
+        reads: List[List[int]] = [[] for _ in transitions]
+        for transition_id, (from_index, nonterminal) in enumerate(transitions):
+            to_index = self._goto[from_index][nonterminal]
+            for symbol in self._goto[to_index]:
+                if isinstance(symbol, Terminal):
+                    read_bits[transition_id] |= 1 << empty_set.get_id(symbol)
+                elif self._fnf.is_nullable(symbol):
+                    reads[transition_id].append(transition_ids[(to_index, symbol)])
+
+        start_transition_id = transition_ids.get((0, self._grammar.start_symbol))
+        if start_transition_id is not None:
+            read_bits[start_transition_id] |= 1 << empty_set.get_id(Dollar())
+
+        LALR.__digraph(read_bits, reads)
+
+        # Includes and lookback, by walking every production rule from every transition on its lhs
+        includes: List[List[int]] = [[] for _ in transitions]
+        lookback: Dict[Tuple[int, int], List[int]] = {}
+        for transition_id, (from_index, nonterminal) in enumerate(transitions):
+            for production_rule in self._grammar.get_production_rules_by_lhs_nonterminal(nonterminal):
+                rhs = [symbol for symbol in production_rule.rhs if symbol is not epsilon]
+                index = from_index
+                for position, symbol in enumerate(rhs):
+                    if isinstance(symbol, Nonterminal) and \
+                            all(isinstance(rest, Nonterminal) and self._fnf.is_nullable(rest)
+                                for rest in rhs[position + 1:]):
+                        includes[transition_ids[(index, symbol)]].append(transition_id)
+
+                    index = self._goto[index][symbol]
+
+                production_rule_index = self._grammar.get_production_rule_index(production_rule)
+                lookback.setdefault((index, production_rule_index), []).append(transition_id)
+
+        LALR.__digraph(read_bits, includes)
+        for key, transition_ids_ in lookback.items():
+            bits = 0
+            for transition_id in transition_ids_:
+                bits |= read_bits[transition_id]
+
+            self.__lookaheads[key] = bits
+
+    def _get_lookaheads(self, index: int, item: LR0Item) -> TerminalSet:
+        production_rule_index = self._grammar.get_production_rule_index(item.production_rule)
+        return self._fnf.get_empty_bits().from_bits(self.__lookaheads.get((index, production_rule_index), 0))
+
+    @staticmethod
+    def __digraph(bits: List[int], edges: List[List[int]]):
+        """
+        Make bits[x] include bits[y] for every path from x to y, in one pass (DeRemer-Pennello digraph). The nodes of
+        a strongly connected component share their bits. Iterative, so long chains don't hit the recursion limit.
+        """
+        infinity = len(bits) + 1
+        depths = [0] * len(bits)
+        stack: List[int] = []
+        for start in range(len(bits)):
+            if depths[start] != 0:
+                continue
+
+            # (node, index of the next edge to visit, depth of the node when it was pushed)
+            stack.append(start)
+            depths[start] = len(stack)
+            calls = [(start, 0, len(stack))]
+            while len(calls) > 0:
+                node, edge_index, depth = calls[-1]
+                if edge_index < len(edges[node]):
+                    calls[-1] = (node, edge_index + 1, depth)
+                    next_node = edges[node][edge_index]
+                    if depths[next_node] == 0:
+                        stack.append(next_node)
+                        depths[next_node] = len(stack)
+                        calls.append((next_node, 0, len(stack)))
+                    else:
+                        depths[node] = min(depths[node], depths[next_node])
+                        bits[node] |= bits[next_node]
+
+                    continue
+
+                calls.pop()
+                # The node is the root of a strongly connected component
+                if depths[node] == depth:
+                    while True:
+                        top = stack.pop()
+                        depths[top] = infinity
+                        bits[top] = bits[node]
+                        if top == node:
+                            break
+
+                if len(calls) > 0:
+                    parent = calls[-1][0]
+                    depths[parent] = min(depths[parent], depths[node])
+                    bits[parent] |= bits[node]
+
+
+def __get_test_grammar__() -> Grammar:
+    # S->L = R | R, L->* R | id, R->L is LALR(1) but not SLR(1): = is in FOLLOW(R)
+    return Grammar(
+        [
+            Nonterminal('S'),
+            Nonterminal('L'),
+            Nonterminal('R')
+        ],
+        [
+            Terminal('='),
+            Terminal('*'),
+            Terminal('id')
+        ],
+        [
+            ProductionRule(Nonterminal('S'),
+                           [
+                               Nonterminal('L'),
+                               Terminal('='),
+                               Nonterminal('R')
+                           ]),
+            ProductionRule(Nonterminal('S'),
+                           [
+                               Nonterminal('R')
+                           ]),
+            ProductionRule(Nonterminal('L'),
+                           [
+                               Terminal('*'),
+                               Nonterminal('R')
+                           ]),
+            ProductionRule(Nonterminal('L'),
+                           [
+                               Terminal('id')
+                           ]),
+            ProductionRule(Nonterminal('R'),
+                           [
+                               Nonterminal('L')
+                           ])
+        ])
+
+
+def test__slr_conflict__():
+    grammar = __get_test_grammar__()
+    with pytest.raises(ShiftReduceConflict):
+        SLR(grammar, FnF(grammar))
+
+
+@pytest.mark.parametrize(
+    "sequence,accepted",
+    [
+        ('id', True),
+        ('id = id', True),
+        ('* id = * * id', True),
+        ('* * id', True),
+        ('id = = id', False),
+        ('= id', False),
+        ('id id', False),
+        ('*', False)
+    ]
+)
+def test__parse__(sequence, accepted):
+    grammar = __get_test_grammar__()
+    lalr = LALR(grammar, FnF(grammar))
+    try:
+        reductions = lalr.parse(Terminal(symbol) for symbol in sequence.split(' '))
+        assert accepted and grammar.production_rules[reductions[-1]].lhs == Nonterminal('S')
+    except ParsingError:
+        assert not accepted
+
+
+@pytest.mark.parametrize(
+    "grammar_content,sequence,result",
+    [
+        ('S->A a|b a c|b A b\nA->epsilon\n', 'b b', True),
+        ('S->A a|b a c|b A b\nA->epsilon\n', 'b a c', True),
+        ('S->A a|b a c|b A b\nA->epsilon\n', 'a', True),
+        ('S->A a|b a c|b A b\nA->epsilon\n', 'b a', False),
+        ('S->A b|b c\nA->epsilon\n', 'b c', ShiftReduceConflict),
+        ('S->A a|B a\nA->epsilon\nB->epsilon\n', 'a', ReduceReduceConflict)
+    ]
+)
+def test__epsilon__(grammar_content, sequence, result, tmp_path):
+    # The first grammar is not SLR(1): FOLLOW(A) has a, which is shifted after b
+    grammar = load_grammar(write_grammar(tmp_path, grammar_content))
+    if result in (ShiftReduceConflict, ReduceReduceConflict):
+        with pytest.raises(result):
+            LALR(grammar, FnF(grammar))
+
+        return
+
+    try:
+        LALR(grammar, FnF(grammar)).parse(Terminal(symbol) for symbol in sequence.split(' '))
+        assert result
+    except ParsingError:
+        assert not result
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
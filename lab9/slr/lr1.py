@@ -0,0 +1,396 @@
+from collections import deque
+from typing import List, Dict, Tuple, Callable
+
+import pytest
+
+from lab9.grammar.grammar import Grammar
+from lab9.grammar.production_rule import ProductionRule
+from lab9.grammar.symbols.dollar import Dollar
+from lab9.grammar.symbols.epsilon import Epsilon
+from lab9.grammar.symbols.nonterminal import Nonterminal
+from lab9.grammar.symbols.symbol import Symbol
+from lab9.grammar.symbols.terminal import Terminal
+from lab9.grammar.utils import load_grammar, write_grammar
+from lab9.slr.closure import Closure, ClosureTransition
+from lab9.slr.first_and_follow import FnF
+from lab9.slr.lalr import LALR
+from lab9.slr.lr0item import LR0Item
+from lab9.slr.slr import SLR, ParsingError, ReduceReduceConflict, ShiftReduceConflict
+from lab9.slr.terminal_set import TerminalSet
+
+
+class LR1State:
+    """
+    Class that represents a state of the LR(1) automaton: a closure of LR0 items whose kernel items carry lookahead
+    bitsets. The kernel items are sorted by (production rule index, dot index), so the lookaheads of two states with
+    the same core are aligned.
+    """
+
+    def __init__(self, closure: Closure, core: Tuple[Tuple[int, int], ...], lookaheads: List[int]):
+        self.__closure = closure
+        self.__core = core
+        self.__lookaheads = lookaheads
+
+    # region Getters and Setters
+
+    @property
+    def closure(self) -> Closure:
+        return self.__closure
+
+    @property
+    def core(self) -> Tuple[Tuple[int, int], ...]:
+        return self.__core
+
+    @property
+    def lookaheads(self) -> List[int]:
+        return self.__lookaheads
+
+    # endregion
+
+    def is_weakly_compatible(self, lookaheads: List[int]) -> bool:
+        """
+        Pager's weak compatibility: merging the lookaheads of two states with the same core doesn't add a reduce/reduce
+        conflict if for every pair of kernel items i, j the merge only mixes lookaheads which already overlapped.
+        """
+        for i in range(len(lookaheads)):
+            for j in range(i + 1, len(lookaheads)):
+                if ((self.__lookaheads[i] & lookaheads[j]) | (lookaheads[i] & self.__lookaheads[j])) and \
+                        not self.__lookaheads[i] & self.__lookaheads[j] and not lookaheads[i] & lookaheads[j]:
+                    return False
+
+        return True
+
+    def merge(self, lookaheads: List[int]) -> bool:
+        """
+        Add the given lookaheads to the kernel items.
+
+        Returns:
+            bool: True if a lookahead was added
+        """
+        changed = False
+        for index, bits in enumerate(lookaheads):
+            if bits & ~self.__lookaheads[index]:
+                self.__lookaheads[index] |= bits
+                changed = True
+
+        return changed
+
+
+class LR1ClosurePlan:
+    """
+    Class that represents how the lookaheads flow inside a closure. It only depends on the core of a state, so it is
+    computed once for all the states with the same core. The items added by the closure get their lookaheads from
+    their lhs: every item B->.x has the union of FIRST(y L) over the items A->z.B y with lookaheads L.
+    """
+
+    def __init__(self, grammar: Grammar, closure: Closure, kernel_size: int,
+                 get_suffix_first: Callable[[LR0Item], Tuple[int, bool]]):
+        """
+        Args:
+            grammar (Grammar): the grammar
+            closure (Closure): the closure, its first kernel_size items are the kernel
+            kernel_size (int): the number of kernel items
+            get_suffix_first (Callable[[LR0Item], Tuple[int, bool]]): FIRST of what follows the current symbol
+        """
+        epsilon = Epsilon()
+        nonterminal_ids: Dict[Nonterminal, int] = {}
+        # For every item: its kernel position, or ~(id of its lhs) for the items added by the closure
+        self.__sources: List[int] = []
+        # (id of B, FIRST(y), kernel position if y is nullable else -1) for every item A->z.B y
+        self.__seeds: List[Tuple[int, int, int]] = []
+        # id of A => ids of B for every added item A->z.B y with y nullable
+        self.__edges: List[List[int]] = []
+        # (symbol, item position, new item, core of the new item) for every item which is not final
+        self.__shifts: List[Tuple[Symbol, int, LR0Item, Tuple[int, int]]] = []
+        # (production rule index, item position) for every final or epsilon item
+        self.__reductions: List[Tuple[int, int]] = []
+
+        def __get_nonterminal_id__(nonterminal: Nonterminal) -> int:
+            nonterminal_id = nonterminal_ids.get(nonterminal)
+            if nonterminal_id is None:
+                nonterminal_id = nonterminal_ids[nonterminal] = len(nonterminal_ids)
+                self.__edges.append([])
+
+            return nonterminal_id
+
+        for position, item in enumerate(closure.lr0items):
+            production_rule_index = grammar.get_production_rule_index(item.production_rule)
+            is_kernel = position < kernel_size
+            self.__sources.append(position if is_kernel else ~__get_nonterminal_id__(item.production_rule.lhs))
+            if item.is_final_item or item.current_symbol is epsilon:
+                self.__reductions.append((production_rule_index, position))
+                continue
+
+            self.__shifts.append((item.current_symbol, position, item.solve(item.current_symbol),
+                                  (production_rule_index, item.dot_index + 1)))
+            if isinstance(item.current_symbol, Nonterminal):
+                first_bits, nullable = get_suffix_first(item)
+                nonterminal_id = __get_nonterminal_id__(item.current_symbol)
+                self.__seeds.append((nonterminal_id, first_bits, position if nullable and is_kernel else -1))
+                if nullable and not is_kernel:
+                    self.__edges[~self.__sources[-1]].append(nonterminal_id)
+
+    # region Getters and Setters
+
+    @property
+    def shifts(self) -> List[Tuple[Symbol, int, LR0Item, Tuple[int, int]]]:
+        return self.__shifts
+
+    @property
+    def reductions(self) -> List[Tuple[int, int]]:
+        return self.__reductions
+
+    # endregion
+
+    def get_item_lookaheads(self, kernel_lookaheads: List[int]) -> List[int]:
+        """
+        Get the lookaheads of every item of the closure from the lookaheads of the kernel items.
+        """
+        bits = [0] * len(self.__edges)
+        for nonterminal_id, first_bits, kernel_position in self.__seeds:
+            bits[nonterminal_id] |= first_bits
+            if kernel_position != -1:
+                bits[nonterminal_id] |= kernel_lookaheads[kernel_position]
+
+        worklist = deque(range(len(bits)))
+        while len(worklist) > 0:
+            from_id = worklist.popleft()
+            for to_id in self.__edges[from_id]:
+                if bits[from_id] & ~bits[to_id]:
+                    bits[to_id] |= bits[from_id]
+                    worklist.append(to_id)
+
+        return [kernel_lookaheads[source] if source >= 0 else bits[~source] for source in self.__sources]
+
+
+class LR1(SLR):
+    """
+    Class that represents a LR(1) parser built with Pager's lane merging: a new state is merged into an existing state
+    with the same core when they are weakly compatible, so the table stays close to the LALR(1) size and only the
+    states which would add a reduce/reduce conflict are split. The lookaheads inside a closure are FIRST bitsets.
+    The parsing table has the same format as the SLR one.
+    """
+
+    def __init__(self, grammar: Grammar, fnf: FnF):
+        # closure index => production rule index => lookahead bits of its final (or epsilon) item
+        self.__lookaheads: List[Dict[int, int]] = []
+        self.__plans: Dict[Tuple[Tuple[int, int], ...], LR1ClosurePlan] = {}
+        super().__init__(grammar, fnf)
+
+    def __get_core_item(self, item: LR0Item) -> Tuple[int, int]:
+        return self._grammar.get_production_rule_index(item.production_rule), item.dot_index
+
+    def __get_suffix_first(self, item: LR0Item) -> Tuple[int, bool]:
+        """
+        Get FIRST of the symbols after the current symbol of an item.
+
+        Returns:
+            Tuple[int, bool]: the bits of the FIRST set and True if the symbols are nullable
+        """
+        bits = 0
+        for symbol in item.production_rule.rhs[item.dot_index + 1:]:
+            if isinstance(symbol, Nonterminal):
+                bits |= self._fnf.get_first_bits(symbol).bits
+                if not self._fnf.is_nullable(symbol):
+                    return bits, False
+            elif isinstance(symbol, Terminal):
+                return bits | (1 << self._fnf.get_empty_bits().get_id(symbol)), False
+
+        return bits, True
+
+    def __get_plan(self, state: LR1State) -> LR1ClosurePlan:
+        plan = self.__plans.get(state.core)
+        if plan is None:
+            plan = self.__plans[state.core] = LR1ClosurePlan(self._grammar, state.closure, len(state.core),
+                                                             self.__get_suffix_first)
+
+        return plan
+
+    def _build_canonical_collection(self):
+        start_item = LR0Item(self._augmented_production)
+        start_core = (self.__get_core_item(start_item),)
+        states: List[LR1State] = [
+            LR1State(Closure(self._grammar, [start_item]), start_core,
+                     [1 << self._fnf.get_empty_bits().get_id(Dollar())])]
+        goto: List[Dict[Symbol, int]] = [{}]
+        states_by_core: Dict[Tuple[Tuple[int, int], ...], List[int]] = {start_core: [0]}
+        dq = deque([0])
+        queued = {0}
+        while len(dq) > 0:
+            state_index = dq.popleft()
+            queued.discard(state_index)
+            state = states[state_index]
+            plan = self.__get_plan(state)
+            item_lookaheads = plan.get_item_lookaheads(state.lookaheads)
+
+            # The kernels of the successors, with the lookaheads carried over the shifted symbol
+            successors: Dict[Symbol, Dict[Tuple[int, int], Tuple[LR0Item, int]]] = {}
+            for symbol, position, new_item, core_item in plan.shifts:
+                kernel = successors.setdefault(symbol, {})
+                _, bits = kernel.get(core_item, (new_item, 0))
+                kernel[core_item] = (new_item, bits | item_lookaheads[position])
+
+            for symbol, kernel in successors.items():
+                core = tuple(sorted(kernel))
+                lookaheads = [kernel[core_item][1] for core_item in core]
+
+                # Prefer the current successor, then any weakly compatible state with the same core
+                candidates = states_by_core.setdefault(core, [])
+                current_index = goto[state_index].get(symbol)
+                if current_index is not None and current_index in candidates:
+                    candidates = [current_index] + [index for index in candidates if index != current_index]
+
+                new_state_index = next((index for index in candidates
+                                        if states[index].is_weakly_compatible(lookaheads)), None)
+                if new_state_index is None:
+                    new_state_index = len(states)
+                    states.append(LR1State(Closure(self._grammar, [kernel[core_item][0] for core_item in core]),
+                                           core, lookaheads))
+                    goto.append({})
+                    states_by_core[core].append(new_state_index)
+                    dq.append(new_state_index)
+                    queued.add(new_state_index)
+                elif states[new_state_index].merge(lookaheads) and new_state_index not in queued:
+                    # The lookaheads grew, they have to be carried to the successors again
+                    dq.append(new_state_index)
+                    queued.add(new_state_index)
+
+                goto[state_index][symbol] = new_state_index
+
+        # A state left behind by a merge may be unreachable, keep only the reachable ones
+        indexes = {0: 0}
+        dq = deque([0])
+        while len(dq) > 0:
+            state_index = dq.popleft()
+            for to_index in goto[state_index].values():
+                if to_index not in indexes:
+                    indexes[to_index] = len(indexes)
+                    dq.append(to_index)
+
+        reachable_states = sorted(indexes, key=indexes.get)
+        self.__states = [states[state_index] for state_index in reachable_states]
+        self._closures = [state.closure for state in self.__states]
+        self._goto = [{symbol: indexes[to_index] for symbol, to_index in goto[state_index].items()}
+                      for state_index in reachable_states]
+        self._transitions = [ClosureTransition(symbol, from_index, to_index)
+                             for from_index, goto_ in enumerate(self._goto) for symbol, to_index in goto_.items()]
+
+    def _build_lookaheads(self):
+        for state in self.__states:
+            plan = self.__get_plan(state)
+            item_lookaheads = plan.get_item_lookaheads(state.lookaheads)
+            self.__lookaheads.append({production_rule_index: item_lookaheads[position]
+                                      for production_rule_index, position in plan.reductions})
+
+    def _get_lookaheads(self, index: int, item: LR0Item) -> TerminalSet:
+        production_rule_index = self._grammar.get_production_rule_index(item.production_rule)
+        return self._fnf.get_empty_bits().from_bits(self.__lookaheads[index].get(production_rule_index, 0))
+
+
+def __get_test_grammar__() -> Grammar:
+    # S->a A d | b B d | a B e | b A e, A->c, B->c is LR(1) but not LALR(1): the A->c. and B->c. states merge
+    return Grammar(
+        [
+            Nonterminal('S'),
+            Nonterminal('A'),
+            Nonterminal('B')
+        ],
+        [
+            Terminal('a'),
+            Terminal('b'),
+            Terminal('c'),
+            Terminal('d'),
+            Terminal('e')
+        ],
+        [
+            ProductionRule(Nonterminal('S'), [Terminal('a'), Nonterminal('A'), Terminal('d')]),
+            ProductionRule(Nonterminal('S'), [Terminal('b'), Nonterminal('B'), Terminal('d')]),
+            ProductionRule(Nonterminal('S'), [Terminal('a'), Nonterminal('B'), Terminal('e')]),
+            ProductionRule(Nonterminal('S'), [Terminal('b'), Nonterminal('A'), Terminal('e')]),
+            ProductionRule(Nonterminal('A'), [Terminal('c')]),
+            ProductionRule(Nonterminal('B'), [Terminal('c')])
+        ])
+
+
+def test__lalr_conflict__():
+    grammar = __get_test_grammar__()
+    with pytest.raises(ReduceReduceConflict):
+        LALR(grammar, FnF(grammar))
+
+
+@pytest.mark.parametrize(
+    "sequence,reductions",
+    [
+        ('a c d', [4, 0]),
+        ('b c d', [5, 1]),
+        ('a c e', [5, 2]),
+        ('b c e', [4, 3]),
+        ('a c c', None),
+        ('c', None),
+        ('a c', None)
+    ]
+)
+def test__parse__(sequence, reductions):
+    grammar = __get_test_grammar__()
+    lr1 = LR1(grammar, FnF(grammar))
+    try:
+        assert lr1.parse(Terminal(symbol) for symbol in sequence.split(' ')) == reductions
+    except ParsingError:
+        assert reductions is None
+
+
+def test__lalr_size__():
+    # Without reduce/reduce conflicts the states merge down to the LALR(1) automaton
+    grammar = Grammar(
+        [Nonterminal('S'), Nonterminal('L'), Nonterminal('R')],
+        [Terminal('='), Terminal('*'), Terminal('id')],
+        [
+            ProductionRule(Nonterminal('S'), [Nonterminal('L'), Terminal('='), Nonterminal('R')]),
+            ProductionRule(Nonterminal('S'), [Nonterminal('R')]),
+            ProductionRule(Nonterminal('L'), [Terminal('*'), Nonterminal('R')]),
+            ProductionRule(Nonterminal('L'), [Terminal('id')]),
+            ProductionRule(Nonterminal('R'), [Nonterminal('L')])
+        ])
+    fnf = FnF(grammar)
+    lr1 = LR1(grammar, fnf)
+    lalr = LALR(grammar, fnf)
+    assert lr1.parsing_table.rows_count == lalr.parsing_table.rows_count
+    for sequence in ['id', 'id = id', '* id = * * id', '* * id']:
+        buffer = [Terminal(symbol) for symbol in sequence.split(' ')]
+        assert lr1.parse(buffer) == lalr.parse(buffer)
+
+
+@pytest.mark.parametrize(
+    "grammar_content,sequence,reductions",
+    [
+        ('S->a X d|b Y d|a Y e|b X e\nX->c A\nY->c B\nA->epsilon\nB->epsilon\n', 'a c d', [6, 4, 0]),
+        ('S->a X d|b Y d|a Y e|b X e\nX->c A\nY->c B\nA->epsilon\nB->epsilon\n', 'b c d', [7, 5, 1]),
+        ('S->a X d|b Y d|a Y e|b X e\nX->c A\nY->c B\nA->epsilon\nB->epsilon\n', 'a c e', [7, 5, 2]),
+        ('S->a X d|b Y d|a Y e|b X e\nX->c A\nY->c B\nA->epsilon\nB->epsilon\n', 'b c e', [6, 4, 3]),
+        ('S->a X d|b Y d|a Y e|b X e\nX->c A\nY->c B\nA->epsilon\nB->epsilon\n', 'a c', None),
+        ('S->A b|b c\nA->epsilon\n', 'b c', ShiftReduceConflict),
+        ('S->A a|B a\nA->epsilon\nB->epsilon\n', 'a', ReduceReduceConflict)
+    ]
+)
+def test__epsilon__(grammar_content, sequence, reductions, tmp_path):
+    # In the first grammar the states after a c and b c merge in LALR(1), where A->epsilon and B->epsilon both
+    # reduce on d and e, but not in LR(1)
+    grammar = load_grammar(write_grammar(tmp_path, grammar_content))
+    if reductions in (ShiftReduceConflict, ReduceReduceConflict):
+        with pytest.raises(reductions):
+            LR1(grammar, FnF(grammar))
+
+        return
+
+    with pytest.raises(ReduceReduceConflict):
+        LALR(grammar, FnF(grammar))
+
+    lr1 = LR1(grammar, FnF(grammar))
+    try:
+        assert lr1.parse(Terminal(symbol) for symbol in sequence.split(' ')) == reductions
+    except ParsingError:
+        assert reductions is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
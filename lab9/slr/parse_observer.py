@@ -0,0 +1,87 @@
+from collections import deque
+from typing import List, Deque, Union
+
+from lab9.grammar.production_rule import ProductionRule
+from lab9.grammar.symbols.nonterminal import Nonterminal
+from lab9.grammar.symbols.symbol import Symbol
+
+
+class ParseObserver:
+    """
+    Class that observes the steps of a SLR parse. Every method does nothing, subclasses override only the events
+    they need. The parser calls them in order: a shift, a reduce followed by its goto, an accept or an error.
+    A parse which recovers from errors also pops closures without a reduce and shifts the error pseudo terminal or
+    a nonterminal.
+    """
+
+    def on_shift(self, from_index: int, to_index: int, symbol: Symbol, position: int):
+        pass
+
+    def on_reduce(self, from_index: int, production_rule_index: int, production_rule: ProductionRule,
+                  pop_count: int):
+        pass
+
+    def on_goto(self, from_index: int, to_index: int, nonterminal: Nonterminal):
+        pass
+
+    def on_accept(self, from_index: int, symbol: Symbol):
+        pass
+
+    def on_error(self, from_index: int, symbol: Symbol, position: int):
+        pass
+
+    def on_pop(self, from_index: int, pop_count: int):
+        pass
+
+
+class TraceObserver(ParseObserver):
+    """
+    Class that records a human readable trace of every step of a parse, including the whole stack at every step.
+    """
+
+    def __init__(self):
+        self.__result: List[str] = []
+        self.__stack: Deque[Union[int, Symbol]] = deque([0])  # Start from the first closure.
+        self.__step_index = 0
+
+    @property
+    def result(self) -> List[str]:
+        return self.__result
+
+    def __step(self):
+        self.__step_index += 1
+        self.__result.append(f"=== STEP {self.__step_index} ===\n-> STACK STATE: {self.__stack}")
+
+    def on_shift(self, from_index: int, to_index: int, symbol: Symbol, position: int):
+        self.__step()
+        self.__result.append(f"SHIFT: from {from_index} to {to_index} with {symbol}.")
+        self.__stack.append(symbol)
+        self.__stack.append(to_index)
+
+    def on_reduce(self, from_index: int, production_rule_index: int, production_rule: ProductionRule,
+                  pop_count: int):
+        self.__step()
+        self.__result.append(f"REDUCE: use production rule {production_rule}.")
+        for _ in range(pop_count):  # Pop 2*len(rhs) items.
+            self.__stack.pop()
+            self.__stack.pop()
+
+    def on_goto(self, from_index: int, to_index: int, nonterminal: Nonterminal):
+        self.__stack.append(nonterminal)
+        self.__step()
+        self.__result.append(f"GOTO: from {from_index} to {to_index} with {nonterminal}.")
+        self.__stack.append(to_index)
+
+    def on_accept(self, from_index: int, symbol: Symbol):
+        self.__step()
+        self.__result.append(f"END: from {from_index} to ACCEPTED with {symbol}")
+
+    def on_error(self, from_index: int, symbol: Symbol, position: int):
+        self.__step()
+
+    def on_pop(self, from_index: int, pop_count: int):
+        self.__step()
+        self.__result.append(f"POP: {pop_count} states from {from_index}.")
+        for _ in range(pop_count):
+            self.__stack.pop()
+            self.__stack.pop()
@@ -0,0 +1,352 @@
+from array import array
+from typing import List, Dict, Callable, Any, Sequence
+
+import pytest
+
+from lab9.grammar.grammar import Grammar
+from lab9.grammar.production_rule import ProductionRule
+from lab9.grammar.symbols.nonterminal import Nonterminal
+from lab9.grammar.symbols.symbol import Symbol
+from lab9.grammar.symbols.terminal import Terminal
+from lab9.grammar.utils import load_grammar, write_grammar
+from lab9.slr.diagnostic import ERROR_TERMINAL
+from lab9.slr.parse_observer import ParseObserver
+
+
+class ParseTree:
+    """
+    Class that represents a parse tree stored in flat arrays. A node is a production rule index and a slice of the
+    children array, leaves have the production rule index -1 and keep their terminal and its position instead.
+    Children are always built before their parent, so the root is the last node.
+    """
+
+    def __init__(self, production_rules: List[ProductionRule]):
+        self.__production_rules = production_rules
+        self.__production_rule_indexes = array('i')
+        self.__child_starts = array('i')
+        self.__child_counts = array('i')
+        self.__children = array('i')
+        self.__terminals: List[Symbol] = []
+        # The position in the buffer of every leaf, -1 for inner nodes
+        self.__positions = array('i')
+
+    # region Getters and Setters
+
+    @property
+    def root(self) -> int:
+        return len(self.__production_rule_indexes) - 1
+
+    # endregion
+
+    def __len__(self):
+        return len(self.__production_rule_indexes)
+
+    def __repr__(self):
+        # Iterative, a long right recursive derivation would be too deep for a recursive walk.
+        parts = []
+        stack = [self.root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif self.is_leaf(node):
+                parts.append(repr(self.get_symbol(node)))
+            else:
+                parts.append(f"{repr(self.get_symbol(node))}[")
+                stack.append(']')
+                children = self.get_children(node)
+                for index in range(len(children) - 1, -1, -1):
+                    stack.append(children[index])
+                    if index > 0:
+                        stack.append(' ')
+
+        return ''.join(parts)
+
+    def __str__(self):
+        return repr(self)
+
+    def add_leaf(self, terminal: Symbol, position: int) -> int:
+        """
+        Add a leaf for a terminal of the buffer.
+
+        Args:
+            terminal (Symbol): the terminal (the error pseudo terminal or a nonterminal shifted by error recovery)
+            position (int): the position of the terminal in the buffer
+
+        Returns:
+            int: the index of the new node
+        """
+        self.__production_rule_indexes.append(-1)
+        self.__child_starts.append(len(self.__terminals))
+        self.__child_counts.append(0)
+        self.__terminals.append(terminal)
+        self.__positions.append(position)
+        return len(self.__production_rule_indexes) - 1
+
+    def add_node(self, production_rule_index: int, children: List[int]) -> int:
+        """
+        Add an inner node for a reduction.
+
+        Args:
+            production_rule_index (int): the index of the production rule used for the reduction
+            children (List[int]): the nodes of the rhs, in order
+
+        Returns:
+            int: the index of the new node
+        """
+        self.__production_rule_indexes.append(production_rule_index)
+        self.__child_starts.append(len(self.__children))
+        self.__child_counts.append(len(children))
+        self.__children.extend(children)
+        self.__positions.append(-1)
+        return len(self.__production_rule_indexes) - 1
+
+    def remove_from(self, node: int):
+        """
+        Remove a node and every node added after it, e.g. the subtrees popped by error recovery.
+
+        Args:
+            node (int): the first removed node
+        """
+        for removed_node in range(node, len(self.__production_rule_indexes)):
+            if self.is_leaf(removed_node):
+                del self.__terminals[self.__child_starts[removed_node]:]
+                break
+
+        for removed_node in range(node, len(self.__production_rule_indexes)):
+            if not self.is_leaf(removed_node):
+                del self.__children[self.__child_starts[removed_node]:]
+                break
+
+        for nodes in (self.__production_rule_indexes, self.__child_starts, self.__child_counts, self.__positions):
+            del nodes[node:]
+
+    def is_leaf(self, node: int) -> bool:
+        return self.__production_rule_indexes[node] == -1
+
+    def get_production_rule_index(self, node: int) -> int:
+        """
+        Return the production rule index of a node.
+
+        Args:
+            node (int): the node
+
+        Returns:
+            int: the index of the production rule used for the node, -1 for leaves
+        """
+        return self.__production_rule_indexes[node]
+
+    def get_position(self, node: int) -> int:
+        """
+        Return the position of a leaf in the buffer.
+
+        Args:
+            node (int): the leaf
+
+        Returns:
+            int: the position of the terminal, -1 for inner nodes
+        """
+        return self.__positions[node]
+
+    def get_symbol(self, node: int) -> Symbol:
+        """
+        Return the symbol of a node.
+
+        Args:
+            node (int): the node
+
+        Returns:
+            Symbol: the terminal for leaves, the lhs nonterminal of the production rule for inner nodes
+        """
+        production_rule_index = self.__production_rule_indexes[node]
+        if production_rule_index == -1:
+            return self.__terminals[self.__child_starts[node]]
+
+        return self.__production_rules[production_rule_index].lhs
+
+    def get_children(self, node: int) -> array:
+        start = self.__child_starts[node]
+        return self.__children[start:start + self.__child_counts[node]] if not self.is_leaf(node) else array('i')
+
+
+class ParseTreeBuilder(ParseObserver):
+    """
+    Class that builds the parse tree while parsing, the stack of the parser is mirrored by a stack of nodes.
+    """
+
+    def __init__(self, grammar: Grammar):
+        self.__tree = ParseTree(grammar.production_rules)
+        self.__nodes: List[int] = []
+
+    @property
+    def tree(self) -> ParseTree:
+        return self.__tree
+
+    def on_shift(self, from_index: int, to_index: int, symbol: Symbol, position: int):
+        self.__nodes.append(self.__tree.add_leaf(symbol, position))
+
+    def on_reduce(self, from_index: int, production_rule_index: int, production_rule: ProductionRule,
+                  pop_count: int):
+        children = self.__nodes[len(self.__nodes) - pop_count:]
+        del self.__nodes[len(self.__nodes) - pop_count:]
+        self.__nodes.append(self.__tree.add_node(production_rule_index, children))
+
+    def on_pop(self, from_index: int, pop_count: int):
+        # The popped subtrees are the last nodes of the tree
+        del self.__nodes[len(self.__nodes) - pop_count:]
+        self.__tree.remove_from(self.__nodes[-1] + 1 if len(self.__nodes) > 0 else 0)
+
+
+class SemanticActions(ParseObserver):
+    """
+    Class that evaluates semantic actions while parsing, the stack of the parser is mirrored by a stack of values.
+    An action receives the values of the rhs symbols and returns the value of the lhs, like $$ = f($1, ..., $n).
+    A production rule without an action takes the value of its first rhs symbol (None for an empty rhs).
+    """
+
+    def __init__(self, grammar: Grammar, actions: Dict[ProductionRule, Callable[..., Any]],
+                 values: Sequence[Any] = None):
+        """
+        Args:
+            grammar (Grammar): the parsed grammar
+            actions (Dict[ProductionRule, Callable[..., Any]]): the semantic action of every production rule
+            values (Sequence[Any], optional): the values of the terminals, parallel to the buffer. Defaults to None,
+            in which case the value of a terminal is the terminal itself.
+
+        Raises:
+            ValueError: if an action is given for a production rule which is not in the grammar
+        """
+        self.__actions: List[Callable[..., Any]] = [None] * len(grammar.production_rules)
+        for production_rule, action in actions.items():
+            production_rule_index = grammar.get_production_rule_index(production_rule)
+            if production_rule_index == -1:
+                raise ValueError(f"Production rule {production_rule} is not in the grammar.")
+
+            self.__actions[production_rule_index] = action
+
+        self.__values = values
+        self.__stack: List[Any] = []
+
+    @property
+    def result(self) -> Any:
+        return self.__stack[-1] if len(self.__stack) > 0 else None
+
+    def on_shift(self, from_index: int, to_index: int, symbol: Symbol, position: int):
+        if symbol is ERROR_TERMINAL or isinstance(symbol, Nonterminal):
+            # Shifted by the error recovery, it has no value
+            self.__stack.append(None)
+        else:
+            self.__stack.append(symbol if self.__values is None else self.__values[position])
+
+    def on_reduce(self, from_index: int, production_rule_index: int, production_rule: ProductionRule,
+                  pop_count: int):
+        arguments = self.__stack[len(self.__stack) - pop_count:]
+        del self.__stack[len(self.__stack) - pop_count:]
+        action = self.__actions[production_rule_index]
+        if action is not None:
+            self.__stack.append(action(*arguments))
+        else:
+            self.__stack.append(arguments[0] if len(arguments) > 0 else None)
+
+    def on_pop(self, from_index: int, pop_count: int):
+        del self.__stack[len(self.__stack) - pop_count:]
+
+
+def __get_test_grammar__() -> Grammar:
+    return Grammar(
+        [
+            Nonterminal('E'),
+            Nonterminal('T')
+        ],
+        [
+            Terminal('+'),
+            Terminal('i')
+        ],
+        [
+            ProductionRule(Nonterminal('E'),
+                           [
+                               Nonterminal('T'),
+                               Terminal('+'),
+                               Nonterminal('E')
+                           ]),
+            ProductionRule(Nonterminal('E'),
+                           [
+                               Nonterminal('T')
+                           ]),
+            ProductionRule(Nonterminal('T'),
+                           [
+                               Terminal('i')
+                           ])
+        ])
+
+
+@pytest.mark.parametrize(
+    "sequence,result",
+    [
+        ('i', 'T:E[T:T[t:i]]'),
+        ('i+i', 'T:E[T:T[t:i] t:+ T:E[T:T[t:i]]]')
+    ]
+)
+def test__parse_tree__(sequence, result):
+    from lab9.slr.first_and_follow import FnF
+    from lab9.slr.slr import SLR
+
+    grammar = __get_test_grammar__()
+    slr = SLR(grammar, FnF(grammar))
+    tree = slr.parse_tree([Terminal(symbol) for symbol in sequence])
+    assert repr(tree) == result
+    assert tree.get_symbol(tree.root) == grammar.start_symbol
+    leaves = [node for node in range(len(tree)) if tree.is_leaf(node)]
+    assert [tree.get_position(leaf) for leaf in leaves] == list(range(len(sequence)))
+
+
+@pytest.mark.parametrize(
+    "values,result",
+    [
+        ([1], 1),
+        ([1, '+', 2, '+', 3], 6)
+    ]
+)
+def test__evaluate__(values, result):
+    from lab9.slr.first_and_follow import FnF
+    from lab9.slr.slr import SLR
+
+    grammar = __get_test_grammar__()
+    slr = SLR(grammar, FnF(grammar))
+    actions = {
+        grammar.production_rules[0]: lambda t, plus, e: t + e
+    }
+    buffer = [Terminal('i') if isinstance(value, int) else Terminal(value) for value in values]
+    assert slr.evaluate(buffer, actions, values) == result
+
+
+@pytest.mark.parametrize(
+    "sequence,result,positions",
+    [
+        ('i ; i', 'T:L[T:L[T:S[t:i]] t:; T:S[t:i]]', [0, 1, 2]),
+        ('i ; ) ) ; i', 'T:L[T:L[T:S[t:error]] t:; T:S[t:i]]', [4, 4, 5]),
+        ('( i ) i ; i', 'T:L[T:L[T:S[t:error]] t:; T:S[t:i]]', [4, 4, 5])
+    ]
+)
+def test__parse_tree__recovery__(sequence, result, positions, tmp_path):
+    from lab9.slr.first_and_follow import FnF
+    from lab9.slr.slr import SLR
+
+    grammar = load_grammar(write_grammar(tmp_path, 'L->L ; S|S\nS->i|( S )|error\n'))
+    builder = ParseTreeBuilder(grammar)
+    SLR(grammar, FnF(grammar)).parse_with_recovery([Terminal(symbol) for symbol in sequence.split(' ')],
+                                                   observer=builder)
+    tree = builder.tree
+    assert repr(tree) == result
+    # The leaves keep their positions in the buffer and the popped subtrees are removed
+    leaves = [node for node in range(len(tree)) if tree.is_leaf(node)]
+    assert [tree.get_position(leaf) for leaf in leaves] == positions
+    reachable = [tree.root]
+    for node in reachable:
+        reachable.extend(tree.get_children(node))
+
+    assert sorted(reachable) == list(range(len(tree)))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
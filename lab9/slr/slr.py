@@ -1,18 +1,28 @@
 from collections import deque
 from enum import Enum
 
-from typing import List, Dict, Deque, Union
+from itertools import chain
+from typing import List, Dict, Union, FrozenSet, Tuple, Iterable, Callable, Any, Sequence
+
+import pytest
 
 from lab9.grammar.grammar import Grammar
+from lab9.grammar.precedence import Associativity
 from lab9.grammar.production_rule import ProductionRule
 from lab9.grammar.symbols.dollar import Dollar
 from lab9.grammar.symbols.epsilon import Epsilon
 from lab9.grammar.symbols.nonterminal import Nonterminal
 from lab9.grammar.symbols.symbol import Symbol
 from lab9.grammar.symbols.terminal import Terminal
+from lab9.grammar.utils import load_grammar, write_grammar
 from lab9.slr.closure import Closure, ClosureTransition
+from lab9.slr.compressed_table import CompressedTable
+from lab9.slr.diagnostic import Diagnostic, ERROR_TERMINAL
 from lab9.slr.first_and_follow import FnF
 from lab9.slr.lr0item import LR0Item
+from lab9.slr.parse_observer import ParseObserver, TraceObserver
+from lab9.slr.parse_tree import ParseTree, ParseTreeBuilder, SemanticActions
+from lab9.slr.terminal_set import TerminalSet
 
 
 class ReduceReduceConflict(RuntimeError):
@@ -26,9 +36,14 @@ class ShiftReduceConflict(RuntimeError):
 
 
 class ParsingError(RuntimeError):
-    def __init__(self, temporary_result: List[str], message: str):
+    def __init__(self, temporary_result: List[str], message: str, diagnostic: Diagnostic = None):
         newline = '\n'
-        super().__init__(f"{newline.join([result for result in temporary_result])}\n{message}")
+        super().__init__(newline.join([*temporary_result, message]))
+        self.__diagnostic = diagnostic
+
+    @property
+    def diagnostic(self) -> Diagnostic:
+        return self.__diagnostic
 
 
 class ParsingTableActionState(Enum):
@@ -60,10 +75,29 @@ class ParsingTableAction:
     ACCEPT => the parsed sequence was accepted.
     """
 
+    # The state is packed in the lowest bits of an encoded action, the index in the rest.
+    STATE_BITS = 3
+    STATE_MASK = (1 << STATE_BITS) - 1
+
     def __init__(self, index: int, state: ParsingTableActionState):
         self.__index = index
         self.__state = state
 
+    @staticmethod
+    def encode(index: int, state: ParsingTableActionState) -> int:
+        """
+        Pack an action into one non-negative int. An ERROR action is always encoded as 0.
+        """
+        if state == ParsingTableActionState.ERROR:
+            return 0
+
+        return (max(index, 0) << ParsingTableAction.STATE_BITS) | state.value
+
+    @staticmethod
+    def decode(action: int) -> 'ParsingTableAction':
+        return ParsingTableAction(action >> ParsingTableAction.STATE_BITS,
+                                  ParsingTableActionState(action & ParsingTableAction.STATE_MASK))
+
     @property
     def index(self) -> int:
         return self.__index
@@ -81,38 +115,50 @@ class ParsingTableAction:
 
 class SLR:
     def __init__(self, grammar: Grammar, fnf: FnF):
-        self.__grammar = grammar
-        self.__fnf = fnf
+        self._grammar = grammar
+        self._fnf = fnf
 
         # Canonical collection
-        self.__augmented_production = ProductionRule(
-            Nonterminal(f"{self.__grammar.start_symbol.symbol}'"),
-            [self.__grammar.start_symbol])
-        self.__closures: List[Closure] = []
-        self.__transitions: List[ClosureTransition] = []
-        self.__build_canonical_collection()
-        # [print(f"{index} --- {closure}") for index, closure in enumerate(self.__closures)]  # print for debug
-        # [print(repr(transition)) for transition in self.__transitions]  # print for debug
-
-        # Parsing table
-        self.__parsing_table: List[Dict[Symbol, ParsingTableAction]] = []
+        self._augmented_production = ProductionRule(
+            Nonterminal(f"{self._grammar.start_symbol.symbol}'"),
+            [self._grammar.start_symbol])
+        self._closures: List[Closure] = []
+        self._transitions: List[ClosureTransition] = []
+        # goto[from_index][symbol] = to_index
+        self._goto: List[Dict[Symbol, int]] = []
+        self._build_canonical_collection()
+        # [print(f"{index} --- {closure}") for index, closure in enumerate(self._closures)]  # print for debug
+        # [print(repr(transition)) for transition in self._transitions]  # print for debug
+        self._build_lookaheads()
+
+        # Parsing table, integer encoded and compressed: row = closure index, column = symbol index
+        self.__symbols: List[Symbol] = []
+        self.__symbol_indexes: Dict[Symbol, int] = {}
+        self.__parsing_table: CompressedTable = None
+        # For each production rule: (lhs symbol index, number of states to pop)
+        self.__reductions: List[Tuple[int, int]] = []
         self.__build_parsing_table()
         # [print(x) for x in enumerate(self.__parsing_table)]  # print for debug
 
-    def __build_canonical_collection(self):
+    def _build_canonical_collection(self):
         """
-        Build canonical collection. TODO COMMENT
+        Build the canonical collection of LR0 closures and the transitions between them.
+        Closures are identified by their kernel, so finding an already built closure is a dict lookup.
         """
-        start_closure = Closure(self.__grammar, [LR0Item(self.__augmented_production)])
-        self.__closures = [start_closure]
-        dq = deque([start_closure])
+        epsilon = Epsilon()
+        start_closure = Closure(self._grammar, [LR0Item(self._augmented_production)])
+        self._closures = [start_closure]
+        self._goto = [{}]
+        closure_indexes: Dict[FrozenSet[Tuple[int, int]], int] = {start_closure.kernel: 0}
+        dq = deque([0])
         while len(dq) > 0:
-            closure = dq.popleft()
+            closure_index = dq.popleft()
+            closure = self._closures[closure_index]
             symbols = {}
             # Get non-final items' symbols from the closure
             for item in closure.lr0items:
                 if not item.is_final_item:
-                    if item.current_symbol == Epsilon():
+                    if item.current_symbol is epsilon:
                         continue
                     if item.current_symbol in symbols:
                         symbols[item.current_symbol].append(item)
@@ -120,133 +166,683 @@ class SLR:
                         symbols[item.current_symbol] = [item]
 
             # Solve items
-            closure_index = self.__closures.index(closure)
             for symbol, items in symbols.items():
                 lr0items = []
                 for item in items:
                     lr0items.append(item.solve(symbol))
 
-                new_closure = Closure(self.__grammar, lr0items)
-                if new_closure not in self.__closures:
-                    self.__closures.append(new_closure)
-                    dq.append(new_closure)
+                kernel = Closure.get_kernel(self._grammar, lr0items)
+                new_closure_index = closure_indexes.get(kernel)
+                if new_closure_index is None:
+                    new_closure_index = len(self._closures)
+                    closure_indexes[kernel] = new_closure_index
+                    self._closures.append(Closure(self._grammar, lr0items))
+                    self._goto.append({})
+                    dq.append(new_closure_index)
 
-                new_closure_index = self.__closures.index(new_closure)
-                self.__transitions.append(ClosureTransition(symbol, closure_index, new_closure_index))
+                self._goto[closure_index][symbol] = new_closure_index
+                self._transitions.append(ClosureTransition(symbol, closure_index, new_closure_index))
 
-    def __build_parsing_table(self):
+    @classmethod
+    def from_table(cls, grammar: Grammar, symbols: List[Symbol], parsing_table: CompressedTable) -> 'SLR':
         """
-        Build the parsing table. TODO COMMENT
+        Create a parser from an already built parsing table, without the FnF and the canonical collection.
+
+        Args:
+            grammar (Grammar): the grammar of the parsing table
+            symbols (List[Symbol]): the symbol of every column of the parsing table
+            parsing_table (CompressedTable): the encoded actions (e.g. over a memory mapped file)
+
+        Returns:
+            SLR: a parser which can only parse, it has no closures
         """
+        slr = cls.__new__(cls)
+        slr._grammar = grammar
+        slr._fnf = None
+        slr._augmented_production = ProductionRule(Nonterminal(f"{grammar.start_symbol.symbol}'"),
+                                                    [grammar.start_symbol])
+        slr._closures = []
+        slr._transitions = []
+        slr._goto = []
+        slr.__set_symbols(symbols)
+        slr.__parsing_table = parsing_table
+        return slr
+
+    # region Getters and Setters
 
-        def __find_transition__(symbol: Symbol, from_index: int) -> int:
-            """
-            Find the transition by a symbol and a start index.
-            """
-            for transition in self.__transitions:
-                if transition.symbol == symbol and transition.from_index == from_index:
-                    return transition.to_index
+    @property
+    def grammar(self) -> Grammar:
+        return self._grammar
 
-            return -1  # No transition found
+    @property
+    def symbols(self) -> List[Symbol]:
+        return self.__symbols
+
+    @property
+    def parsing_table(self) -> CompressedTable:
+        return self.__parsing_table
 
-        all_symbols: List[Symbol] = self.__grammar.terminals
-        all_symbols.extend(self.__grammar.nonterminals)
-        all_symbols.append(Dollar())
+    @property
+    def symbol_indexes(self) -> Dict[Symbol, int]:
+        return self.__symbol_indexes
 
-        # Fill table with errors
-        for index in range(len(self.__closures)):
-            symbol_action_dict = {}
-            for symbol in all_symbols:
-                symbol_action_dict[symbol] = ParsingTableAction(index, ParsingTableActionState.ERROR)
+    @property
+    def reductions(self) -> List[Tuple[int, int]]:
+        """
+        For each production rule: (lhs symbol index, number of states to pop).
+        """
+        return self.__reductions
 
-            self.__parsing_table.append(symbol_action_dict)
+    # endregion
 
-        for index, closure in enumerate(self.__closures):
-            # Check for RR Conflict
-            if closure.no_final_items >= 2:
-                final_items = filter(lambda item: item.is_final_item, closure.lr0items)
-                follows_intersection = set.intersection(
-                    *[self.__fnf.get_follow_of_nonterminal(item.production_rule.lhs) for item
-                      in final_items])
-                if len(follows_intersection) != 0:
+    def goto(self, from_index: int, symbol: Symbol) -> int:
+        """
+        Get the closure reached from a closure with a symbol.
+
+        Returns:
+            int: the index of the reached closure, -1 if there is no transition
+        """
+        action = self.get_action(from_index, symbol)
+        if action.state in (ParsingTableActionState.SHIFT, ParsingTableActionState.GOTO):
+            return action.index
+
+        return -1
+
+    def __set_symbols(self, symbols: List[Symbol]):
+        """
+        Number the columns of the parsing table and precompute the lhs column and pop count of every production rule.
+        """
+        epsilon = Epsilon()
+        self.__symbols = symbols
+        self.__symbol_indexes = {symbol: index for index, symbol in enumerate(self.__symbols)}
+        self.__reductions = [
+            (self.__symbol_indexes[production_rule.lhs],
+             0 if epsilon in production_rule.rhs else len(production_rule.rhs))
+            for production_rule in self._grammar.production_rules]
+
+    def _build_lookaheads(self):
+        """
+        Prepare the lookaheads of the reductions once the canonical collection is built. SLR needs nothing more
+        than the FOLLOW sets, other builders override this together with _get_lookaheads.
+        """
+        pass
+
+    def _get_lookaheads(self, index: int, item: LR0Item) -> TerminalSet:
+        """
+        Get the terminals on which a final (or epsilon) item of a closure is reduced.
+
+        Args:
+            index (int): the index of the closure
+            item (LR0Item): the item
+
+        Returns:
+            TerminalSet: for SLR, the FOLLOW set of the lhs of the item
+        """
+        return self._fnf.get_follow_bits(item.production_rule.lhs)
+
+    def __build_parsing_table(self):
+        """
+        Build the parsing table from the canonical collection: reduce on the follow of final/epsilon items, accept on
+        $ in the final closure of the augmented production and shift/goto on the transitions of each closure.
+        Symbols are numbered terminals first, then $, then nonterminals, and every cell holds an encoded action.
+        The rows are built sparse and compressed, the most common reduction of a row becomes its default action.
+        """
+        epsilon = Epsilon()
+        dollar = Dollar()
+        all_symbols = dict.fromkeys([*self._grammar.terminals, dollar, *self._grammar.nonterminals])
+        for production_rule in self._grammar.production_rules:
+            all_symbols.update(dict.fromkeys([production_rule.lhs, *production_rule.rhs]))
+
+        all_symbols.pop(epsilon, None)
+        self.__set_symbols(list(all_symbols))
+
+        # Missing cells are errors, an explicit error cell (%nonassoc) stays an error under a default reduction
+        rows: List[Dict[int, int]] = [{} for _ in self._closures]
+
+        def __set_action__(from_index: int, symbol: Symbol, index: int, state: ParsingTableActionState):
+            rows[from_index][self.__symbol_indexes[symbol]] = ParsingTableAction.encode(index, state)
+
+        for index, closure in enumerate(self._closures):
+            # An epsilon item reduces without moving its dot, like a final item
+            reduce_items = [item for item in closure.lr0items
+                            if item.is_final_item or epsilon in item.production_rule.rhs]
+
+            # Check for RR Conflict, the lookaheads of the final/epsilon items must be disjoint
+            final_lookaheads = {item: self._get_lookaheads(index, item) for item in reduce_items}
+            seen_lookaheads = 0
+            for lookaheads in final_lookaheads.values():
+                if seen_lookaheads & lookaheads.bits:
                     raise ReduceReduceConflict(closure, index)
 
+                seen_lookaheads |= lookaheads.bits
+
             # Reduce for all final/epsilon items
-            for item in closure.lr0items:
-                if item.is_final_item or \
-                        Epsilon() in item.production_rule.rhs:
-                    for follow_symbol in self.__fnf.get_follow_of_nonterminal(item.production_rule.lhs):
-                        self.__parsing_table[index][follow_symbol] = ParsingTableAction(
-                            # Take the index of the production rule with which we should reduce
-                            self.__grammar.production_rules.index(item.production_rule),
-                            ParsingTableActionState.REDUCE
-                        )
-
-            # Decide by transitions
-            for symbol in all_symbols:
-                to_index = __find_transition__(symbol, index)
-
-                # Accept
-                if to_index == -1 and \
-                        closure.is_final_closure and \
-                        len(closure.lr0items) == 1 and \
-                        closure.lr0items[0].production_rule == self.__augmented_production and \
-                        symbol == Dollar():
-                    self.__parsing_table[index][symbol] = ParsingTableAction(to_index,
-                                                                             ParsingTableActionState.ACCEPT)
-                # Shift/Goto
-                elif to_index != -1:
-                    if isinstance(symbol, Nonterminal):
-                        self.__parsing_table[index][symbol] = ParsingTableAction(to_index, ParsingTableActionState.GOTO)
-                    elif isinstance(symbol, Terminal):
-                        for item in closure.lr0items:
-                            if item.is_final_item and \
-                                    symbol in self.__fnf.get_follow_of_nonterminal(item.production_rule.lhs):
-                                raise ShiftReduceConflict(closure, symbol, index)
-
-                        self.__parsing_table[index][symbol] = ParsingTableAction(to_index,
-                                                                                 ParsingTableActionState.SHIFT)
-
-    def parse(self, buffer: List[Symbol]) -> List[str]:
-        buffer.append(Dollar())  # Add $ at the end.
-        result: List[str] = []
-        stack: Deque[Union[int, Symbol]] = deque([0])  # Start from the first closure.
-        i = 0
-        action_index = 1
-        while i < len(buffer):
-            result.append(f"=== STEP {action_index} ===\n-> STACK STATE: {stack}")
+            for item, lookaheads in final_lookaheads.items():
+                for follow_symbol in lookaheads:
+                    # Take the index of the production rule with which we should reduce
+                    __set_action__(index, follow_symbol,
+                                   self._grammar.get_production_rule_index(item.production_rule),
+                                   ParsingTableActionState.REDUCE)
+
+            # Accept, a left recursive start symbol also has its own items in the closure
+            if any(item.is_final_item and item.production_rule == self._augmented_production
+                   for item in closure.lr0items):
+                __set_action__(index, dollar, 0, ParsingTableActionState.ACCEPT)
+
+            # Shift/Goto for the transitions of the closure, a shift conflicts with the lookaheads of any
+            # final/epsilon item
+            all_final_lookaheads = self._fnf.get_empty_bits()
+            for lookaheads in final_lookaheads.values():
+                all_final_lookaheads |= lookaheads
+
+            for symbol, to_index in self._goto[index].items():
+                if isinstance(symbol, Nonterminal):
+                    __set_action__(index, symbol, to_index, ParsingTableActionState.GOTO)
+                elif isinstance(symbol, Terminal):
+                    if symbol in all_final_lookaheads:
+                        state = self.__resolve_shift_reduce_conflict(closure, index, symbol, final_lookaheads)
+                        if state == ParsingTableActionState.REDUCE:
+                            continue  # Keep the reduce
+
+                        if state == ParsingTableActionState.ERROR:
+                            __set_action__(index, symbol, to_index, ParsingTableActionState.ERROR)
+                            continue
+
+                    __set_action__(index, symbol, to_index, ParsingTableActionState.SHIFT)
+
+        self.__parsing_table = CompressedTable.compress(
+            rows, len(self.__symbols), self.__symbol_indexes[dollar] + 1,
+            lambda action: action & ParsingTableAction.STATE_MASK == ParsingTableActionState.REDUCE.value)
+
+    def __resolve_shift_reduce_conflict(self, closure: Closure, index: int, symbol: Terminal,
+                                        final_lookaheads: Dict[LR0Item, TerminalSet]) -> ParsingTableActionState:
+        """
+        Resolve a shift/reduce conflict with the declared precedences, like yacc: the greater precedence of the
+        production rule and of the terminal wins, on equal precedences %left reduces, %right shifts and %nonassoc
+        is an error.
+
+        Raises:
+            ShiftReduceConflict: if the production rule or the terminal has no precedence
+
+        Returns:
+            ParsingTableActionState: SHIFT, REDUCE or ERROR
+        """
+        item = next(item for item, lookaheads in final_lookaheads.items() if symbol in lookaheads)
+        production_rule_precedence = self._grammar.get_precedence_of_production_rule(item.production_rule)
+        terminal_precedence = self._grammar.get_precedence_of_terminal(symbol)
+        if production_rule_precedence is None or terminal_precedence is None:
+            raise ShiftReduceConflict(closure, symbol, index)
+
+        if production_rule_precedence.level > terminal_precedence.level:
+            return ParsingTableActionState.REDUCE
+
+        if production_rule_precedence.level < terminal_precedence.level:
+            return ParsingTableActionState.SHIFT
+
+        return {
+            Associativity.LEFT: ParsingTableActionState.REDUCE,
+            Associativity.RIGHT: ParsingTableActionState.SHIFT,
+            Associativity.NONASSOC: ParsingTableActionState.ERROR
+        }[terminal_precedence.associativity]
+
+    def get_action(self, from_index: int, symbol: Symbol) -> ParsingTableAction:
+        """
+        Decode the action of the parsing table for a closure and a symbol.
+        """
+        symbol_index = self.__symbol_indexes.get(symbol)
+        if symbol_index is None:
+            return ParsingTableAction(from_index, ParsingTableActionState.ERROR)
+
+        action = self.__parsing_table.get(from_index, symbol_index)
+        if action == 0:
+            return ParsingTableAction(from_index, ParsingTableActionState.ERROR)
+
+        return ParsingTableAction.decode(action)
+
+    def get_expected_terminals(self, from_index: int) -> List[Symbol]:
+        """
+        Get the terminals (and $) which have an action in a closure, without the error pseudo terminal.
+        """
+        return [symbol for symbol_index, symbol in enumerate(self.__symbols[:self.__symbol_indexes[Dollar()] + 1])
+                if symbol is not ERROR_TERMINAL and self.__parsing_table.get(from_index, symbol_index) != 0]
+
+    def parse(self, buffer: Iterable[Symbol], trace: bool = False,
+              observer: ParseObserver = None) -> Union[List[int], List[str]]:
+        """
+        Parse a sequence of terminals. The buffer is consumed lazily and $ is added at the end.
+        By default only the production rules used for reductions are kept, the stack holds only closure indexes.
+        Because of the default reductions an error may be found a few reductions later than in a full table, but
+        always before the bad terminal is shifted.
+
+        Args:
+            buffer (Iterable[Symbol]): the terminals
+            trace (bool, optional): return the human readable trace of every step instead. Defaults to False.
+            observer (ParseObserver, optional): receives every step of the parse. Defaults to None.
+
+        Raises:
+            ParsingError: if the sequence is not accepted
+
+        Returns:
+            Union[List[int], List[str]]: the indexes of the production rules used for reductions, in order (i.e. the
+            reversed rightmost derivation), or the trace if trace is True
+        """
+        if trace:
+            if observer is not None:
+                raise ValueError('A traced parse cannot have another observer.')
+
+            observer = TraceObserver()
+
+        production_rules = self._grammar.production_rules
+        symbol_indexes = self.__symbol_indexes
+        defaults = self.__parsing_table.defaults
+        bases = self.__parsing_table.bases
+        checks = self.__parsing_table.checks
+        values = self.__parsing_table.values
+        reductions_info = self.__reductions
+        state_bits = ParsingTableAction.STATE_BITS
+        state_mask = ParsingTableAction.STATE_MASK
+        shift = ParsingTableActionState.SHIFT.value
+        reduce = ParsingTableActionState.REDUCE.value
+        reductions: List[int] = []
+        stack: List[int] = [0]  # Start from the first closure.
+        symbols = chain(buffer, (Dollar(),))  # Add $ at the end.
+        buffer_symbol = next(symbols)
+        position = 0
+        while True:
             from_index = stack[-1]
-            buffer_symbol = buffer[i]
-            action = self.__parsing_table[from_index][buffer_symbol]
-            if action.state == ParsingTableActionState.ERROR:
-                raise ParsingError(result, f"ERROR: no action found at index {from_index} with {buffer_symbol}.")
-
-            elif action.state == ParsingTableActionState.SHIFT:
-                result.append(f"SHIFT: from {from_index} to {action.index} with {buffer_symbol}.")
-                stack.append(buffer_symbol)
-                stack.append(action.index)
-
-            elif action.state == ParsingTableActionState.REDUCE:
-                production_rule = self.__grammar.production_rules[action.index]
-                result.append(f"REDUCE: use production rule {production_rule}.")
-                if not Epsilon() in production_rule.rhs:
-                    for _ in production_rule.rhs:  # Pop 2*len(rhs) items.
-                        stack.pop()
-                        stack.pop()
-
-                action_index += 1
+            symbol_index = symbol_indexes.get(buffer_symbol, -1)
+            if symbol_index == -1:
+                action = 0
+            else:
+                slot = bases[from_index] + symbol_index
+                action = values[slot] if checks[slot] == from_index else defaults[from_index]
+
+            action_state = action & state_mask
+            if action == 0:
+                if observer is not None:
+                    observer.on_error(from_index, buffer_symbol, position)
+
+                diagnostic = Diagnostic(position, from_index, buffer_symbol, self.get_expected_terminals)
+                raise ParsingError(observer.result if trace else [], repr(diagnostic), diagnostic)
+
+            elif action_state == shift:
+                to_index = action >> state_bits
+                if observer is not None:
+                    observer.on_shift(from_index, to_index, buffer_symbol, position)
+
+                stack.append(to_index)
+                buffer_symbol = next(symbols)
+                position += 1
+
+            elif action_state == reduce:
+                production_rule_index = action >> state_bits
+                lhs_index, pop_count = reductions_info[production_rule_index]
+                if observer is not None:
+                    observer.on_reduce(from_index, production_rule_index, production_rules[production_rule_index],
+                                       pop_count)
+
+                if pop_count:
+                    del stack[-pop_count:]
+
                 from_index = stack[-1]
-                stack.append(production_rule.lhs)
-                result.append(f"=== STEP {action_index} ===\n-> STACK STATE: {stack}")
-                action = self.__parsing_table[from_index][production_rule.lhs]
-                result.append(f"GOTO: from {from_index} to {action.index} with {production_rule.lhs}.")
-                stack.append(action.index)
-                i -= 1  # Performed a reduce, decrement i
+                to_index = values[bases[from_index] + lhs_index] >> state_bits  # A goto is never a default
+                if observer is not None:
+                    observer.on_goto(from_index, to_index, production_rules[production_rule_index].lhs)
+
+                stack.append(to_index)
+                reductions.append(production_rule_index)
 
-            elif action.state == ParsingTableActionState.ACCEPT:
-                result.append(f"END: from {from_index} to ACCEPTED with {buffer_symbol}")
+            else:  # Accept
+                if observer is not None:
+                    observer.on_accept(from_index, buffer_symbol)
 
-            i += 1
-            action_index += 1
+                break
 
-        return result
+        return observer.result if trace else reductions
+
+    def parse_with_recovery(self, buffer: Iterable[Symbol], sync_terminals: Iterable[Symbol] = None,
+                            observer: ParseObserver = None) -> Tuple[List[int], List[Diagnostic]]:
+        """
+        Parse a sequence of terminals and recover from the syntax errors in panic mode, so every error is found in
+        one parse. On an error the stack is popped down to a closure which shifts the error pseudo terminal of the
+        error production rules (e.g. STATEMENT->error ;) and the error is shifted, like in yacc. Without such a
+        closure, the stack is popped down to a closure with a goto on a nonterminal A and terminals are skipped up
+        to a sync terminal which can follow A there, then A is shifted as if it was reduced. New errors are not
+        reported until 3 terminals are shifted and an error before any of them is shifted skips the terminal, so
+        one mistake gives one diagnostic and the parse always ends. The parse gives up at $ if nothing can recover.
+
+        Args:
+            buffer (Iterable[Symbol]): the terminals
+            sync_terminals (Iterable[Symbol], optional): the terminals to resume on (e.g. ; and }), $ is always one.
+            Defaults to None, in which case every terminal is a sync terminal.
+            observer (ParseObserver, optional): receives every step of the parse, on_pop for the popped closures and
+            on_shift for the shifted error and nonterminals. Defaults to None.
+
+        Returns:
+            Tuple[List[int], List[Diagnostic]]: the indexes of the production rules used for reductions, in order,
+            and the syntax errors, in order (empty if the sequence was accepted)
+        """
+        symbol_indexes = self.__symbol_indexes
+        parsing_table = self.__parsing_table
+        reductions_info = self.__reductions
+        state_bits = ParsingTableAction.STATE_BITS
+        state_mask = ParsingTableAction.STATE_MASK
+        shift = ParsingTableActionState.SHIFT.value
+        reduce = ParsingTableActionState.REDUCE.value
+        goto_state = ParsingTableActionState.GOTO.value
+        dollar = Dollar()
+        nonterminal_indexes = range(symbol_indexes[dollar] + 1, len(self.__symbols))
+        error_index = symbol_indexes.get(ERROR_TERMINAL, -1)
+        sync_indexes = None if sync_terminals is None else \
+            {symbol_indexes.get(symbol, -1) for symbol in sync_terminals} | {symbol_indexes[dollar]}
+        reductions: List[int] = []
+        diagnostics: List[Diagnostic] = []
+        stack: List[int] = [0]  # Start from the first closure.
+        symbols = chain(buffer, (dollar,))  # Add $ at the end.
+        buffer_symbol = next(symbols)
+        position = 0
+        # The terminals left to shift before a new error is reported
+        recovering = 0
+
+        def __get_action__(from_index: int, symbol_index: int) -> int:
+            return 0 if symbol_index == -1 else parsing_table.get(from_index, symbol_index)
+
+        def __pop_to__(depth: int):
+            if depth < len(stack) - 1:
+                if observer is not None:
+                    observer.on_pop(stack[-1], len(stack) - 1 - depth)
+
+                del stack[depth + 1:]
+
+        def __find_goto__(symbol_index: int) -> Tuple[int, int, int]:
+            # The topmost closure with a goto on a nonterminal which can be followed by the terminal
+            for depth in range(len(stack) - 1, -1, -1):
+                for nonterminal_index in nonterminal_indexes:
+                    action = parsing_table.get(stack[depth], nonterminal_index)
+                    if action & state_mask == goto_state and __get_action__(action >> state_bits, symbol_index) != 0:
+                        return depth, nonterminal_index, action >> state_bits
+
+            return None
+
+        while True:
+            from_index = stack[-1]
+            symbol_index = symbol_indexes.get(buffer_symbol, -1)
+            action = __get_action__(from_index, symbol_index)
+            action_state = action & state_mask
+            if action == 0:
+                if recovering == 0:
+                    diagnostics.append(Diagnostic(position, from_index, buffer_symbol, self.get_expected_terminals))
+                    if observer is not None:
+                        observer.on_error(from_index, buffer_symbol, position)
+
+                elif recovering == 3:
+                    # Nothing was shifted since the last error, skip the terminal
+                    if buffer_symbol is dollar:
+                        break
+
+                    buffer_symbol = next(symbols)
+                    position += 1
+
+                recovering = 3
+                # The topmost closure which shifts the error pseudo terminal
+                depth = next((depth for depth in range(len(stack) - 1, -1, -1)
+                              if __get_action__(stack[depth], error_index) & state_mask == shift), -1)
+                if depth != -1:
+                    __pop_to__(depth)
+                    to_index = __get_action__(stack[-1], error_index) >> state_bits
+                    if observer is not None:
+                        observer.on_shift(stack[-1], to_index, ERROR_TERMINAL, position)
+
+                    stack.append(to_index)
+                    continue
+
+                # Skip up to a sync terminal which can follow a nonterminal of a closure of the stack
+                while True:
+                    symbol_index = symbol_indexes.get(buffer_symbol, -1)
+                    if sync_indexes is None or symbol_index in sync_indexes:
+                        goto = __find_goto__(symbol_index)
+                        if goto is not None:
+                            depth, nonterminal_index, to_index = goto
+                            __pop_to__(depth)
+                            if observer is not None:
+                                observer.on_shift(stack[-1], to_index, self.__symbols[nonterminal_index], position)
+
+                            stack.append(to_index)
+                            break
+
+                    if buffer_symbol is dollar:
+                        return reductions, diagnostics
+
+                    buffer_symbol = next(symbols)
+                    position += 1
+
+            elif action_state == shift:
+                to_index = action >> state_bits
+                if observer is not None:
+                    observer.on_shift(from_index, to_index, buffer_symbol, position)
+
+                stack.append(to_index)
+                buffer_symbol = next(symbols)
+                position += 1
+                recovering = max(recovering - 1, 0)
+
+            elif action_state == reduce:
+                production_rule_index = action >> state_bits
+                lhs_index, pop_count = reductions_info[production_rule_index]
+                if observer is not None:
+                    observer.on_reduce(from_index, production_rule_index,
+                                       self._grammar.production_rules[production_rule_index], pop_count)
+
+                if pop_count:
+                    del stack[-pop_count:]
+
+                from_index = stack[-1]
+                to_index = parsing_table.get(from_index, lhs_index) >> state_bits
+                if observer is not None:
+                    observer.on_goto(from_index, to_index, self._grammar.production_rules[production_rule_index].lhs)
+
+                stack.append(to_index)
+                reductions.append(production_rule_index)
+
+            else:  # Accept
+                if observer is not None:
+                    observer.on_accept(from_index, buffer_symbol)
+
+                break
+
+        return reductions, diagnostics
+
+    def parse_tree(self, buffer: Iterable[Symbol]) -> ParseTree:
+        """
+        Parse a sequence of terminals and build its parse tree.
+
+        Args:
+            buffer (Iterable[Symbol]): the terminals
+
+        Raises:
+            ParsingError: if the sequence is not accepted
+
+        Returns:
+            ParseTree: the parse tree, its root is the start symbol
+        """
+        builder = ParseTreeBuilder(self._grammar)
+        self.parse(buffer, observer=builder)
+        return builder.tree
+
+    def evaluate(self, buffer: Iterable[Symbol], actions: Dict[ProductionRule, Callable[..., Any]],
+                 values: Sequence[Any] = None) -> Any:
+        """
+        Parse a sequence of terminals and evaluate the semantic actions of the reductions, in one pass.
+
+        Args:
+            buffer (Iterable[Symbol]): the terminals
+            actions (Dict[ProductionRule, Callable[..., Any]]): the semantic action of every production rule
+            values (Sequence[Any], optional): the values of the terminals, parallel to the buffer. Defaults to None.
+
+        Raises:
+            ParsingError: if the sequence is not accepted
+
+        Returns:
+            Any: the value of the start symbol
+        """
+        semantic_actions = SemanticActions(self._grammar, actions, values)
+        self.parse(buffer, observer=semantic_actions)
+        return semantic_actions.result
+
+
+@pytest.mark.parametrize(
+    "index,state",
+    [
+        (0, ParsingTableActionState.ACCEPT),
+        (5, ParsingTableActionState.SHIFT),
+        (123456, ParsingTableActionState.REDUCE),
+        (7, ParsingTableActionState.GOTO)
+    ]
+)
+def test__encode__(index, state):
+    action = ParsingTableAction.decode(ParsingTableAction.encode(index, state))
+    assert action.index == index and action.state == state
+    assert ParsingTableAction.encode(index, ParsingTableActionState.ERROR) == 0
+
+
+@pytest.mark.parametrize(
+    "sequence,accepted",
+    [
+        (['i'], True),
+        (['i', '+', 'i', '+', 'i'], True),
+        (['i', '+'], False),
+        (['+', 'i'], False),
+        (['i', 'i'], False)
+    ]
+)
+def test__parse__(sequence, accepted):
+    grammar = Grammar(
+        [
+            Nonterminal('E'),
+            Nonterminal('T')
+        ],
+        [
+            Terminal('+'),
+            Terminal('i')
+        ],
+        [
+            ProductionRule(Nonterminal('E'),
+                           [
+                               Nonterminal('T'),
+                               Terminal('+'),
+                               Nonterminal('E')
+                           ]),
+            ProductionRule(Nonterminal('E'),
+                           [
+                               Nonterminal('T')
+                           ]),
+            ProductionRule(Nonterminal('T'),
+                           [
+                               Terminal('i')
+                           ])
+        ])
+    slr = SLR(grammar, FnF(grammar))
+    try:
+        reductions = slr.parse(Terminal(symbol) for symbol in sequence)
+        assert accepted and grammar.production_rules[reductions[-1]].lhs == Nonterminal('E')
+        result = slr.parse([Terminal(symbol) for symbol in sequence], trace=True)
+        assert result[-1].startswith('END')
+        assert len([step for step in result if step.startswith('REDUCE')]) == len(reductions)
+    except ParsingError:
+        assert not accepted
+
+
+@pytest.mark.parametrize(
+    "grammar_content,sequence,result",
+    [
+        ('S->A b|c\nA->epsilon\n', 'b', True),
+        ('S->A b|c\nA->epsilon\n', 'c', True),
+        ('S->A b|c\nA->epsilon\n', 'c b', False),
+        ('S->A b|b c\nA->epsilon\n', 'b c', ShiftReduceConflict),
+        ('S->A a|B a\nA->epsilon\nB->epsilon\n', 'a', ReduceReduceConflict),
+        ('S->A a|b a c|b A b\nA->epsilon\n', 'b b', ShiftReduceConflict)
+    ]
+)
+def test__epsilon__(grammar_content, sequence, result, tmp_path):
+    # An epsilon item reduces like a final item, so its lookaheads are checked for conflicts too
+    grammar = load_grammar(write_grammar(tmp_path, grammar_content))
+    if result in (ShiftReduceConflict, ReduceReduceConflict):
+        with pytest.raises(result):
+            SLR(grammar, FnF(grammar))
+
+        return
+
+    try:
+        SLR(grammar, FnF(grammar)).parse(Terminal(symbol) for symbol in sequence.split(' '))
+        assert result
+    except ParsingError:
+        assert not result
+
+
+@pytest.mark.parametrize(
+    "declarations,sequence,result",
+    [
+        ('%left + -\n%left *\n%right ^\n', '1 + 2 * 3', 7),
+        ('%left + -\n%left *\n%right ^\n', '2 * 3 + 1', 7),
+        ('%left + -\n%left *\n%right ^\n', '5 - 2 - 1', 2),
+        ('%left + -\n%left *\n%right ^\n', '2 ^ 3 ^ 2', 512),
+        ('%left + -\n%left *\n%right ^\n', '2 * 2 ^ 3 - 1', 15),
+        ('%right + -\n%left *\n%right ^\n', '5 - 2 - 1', 4),
+        ('%nonassoc + - * ^\n', '1 + 2', 3),
+        ('%nonassoc + - * ^\n', '1 + 2 - 3', ParsingError),
+        ('%left +\n', '1 + 2', ShiftReduceConflict),
+        ('', '1 + 2', ShiftReduceConflict)
+    ]
+)
+def test__precedence__(declarations, sequence, result, tmp_path):
+    grammar = load_grammar(write_grammar(tmp_path, f"{declarations}E->E + E|E - E|E * E|E ^ E|n\n"))
+    operations = {
+        '+': lambda a, b: a + b,
+        '-': lambda a, b: a - b,
+        '*': lambda a, b: a * b,
+        '^': lambda a, b: a ** b
+    }
+    actions = {
+        production_rule: (lambda operation: lambda a, _, b: operation(a, b))(
+            operations[production_rule.rhs[1].symbol])
+        for production_rule in grammar.production_rules if len(production_rule.rhs) == 3}
+    values = [int(value) if value.isdigit() else value for value in sequence.split(' ')]
+    buffer = [Terminal('n') if isinstance(value, int) else Terminal(value) for value in values]
+    try:
+        assert SLR(grammar, FnF(grammar)).evaluate(buffer, actions, values) == result
+    except (ParsingError, ShiftReduceConflict) as e:
+        assert isinstance(e, result)
+
+
+@pytest.mark.parametrize(
+    "grammar_content,sync_terminals,sequence,positions",
+    [
+        ('L->L ; S|S\nS->i|( S )|error\n', None, 'i ; i', []),
+        ('L->L ; S|S\nS->i|( S )|error\n', None, 'i ; ) ; i', [2]),
+        ('L->L ; S|S\nS->i|( S )|error\n', None, '( i ; i ) ; ( ( i', [2, 9]),
+        ('L->L ; S|S\nS->i|( S )\n', [';'], 'i ; ) ; i', [2]),
+        ('L->L ; S|S\nS->i|( S )\n', [';'], 'i i i ; ( ; i', [1]),
+        ('L->L ; S|S\nS->i|( S )\n', None, ') ; i ; ( i ; i', [0, 6]),
+        ('L->L ; S|S\nS->i|( S )\n', None, '', [0])
+    ]
+)
+def test__parse_with_recovery__(grammar_content, sync_terminals, sequence, positions, tmp_path):
+    grammar = load_grammar(write_grammar(tmp_path, grammar_content))
+    slr = SLR(grammar, FnF(grammar))
+    buffer = [Terminal(symbol) for symbol in sequence.split(' ') if symbol]
+    reductions, diagnostics = slr.parse_with_recovery(
+        buffer, None if sync_terminals is None else [Terminal(symbol) for symbol in sync_terminals])
+    assert [diagnostic.position for diagnostic in diagnostics] == positions
+    for diagnostic in diagnostics:
+        assert diagnostic.symbol not in diagnostic.expected and ERROR_TERMINAL not in diagnostic.expected
+
+    # The first diagnostic is the error of a parse without recovery
+    try:
+        assert reductions == slr.parse(buffer) and len(positions) == 0
+    except ParsingError as e:
+        assert (e.diagnostic.position, e.diagnostic.state) == (diagnostics[0].position, diagnostics[0].state)
+        assert str(e) == repr(diagnostics[0])
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
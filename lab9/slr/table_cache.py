@@ -0,0 +1,343 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from typing import Type
+
+import pytest
+
+from lab9.grammar.grammar import Grammar
+from lab9.grammar.production_rule import ProductionRule
+from lab9.grammar.symbols.dollar import Dollar
+from lab9.grammar.symbols.epsilon import Epsilon
+from lab9.grammar.symbols.nonterminal import Nonterminal
+from lab9.grammar.symbols.terminal import Terminal
+from lab9.grammar.utils import load_grammar
+from lab9.slr.compressed_table import CompressedTable
+from lab9.slr.filters import is_left_recursive, is_deterministic
+from lab9.slr.first_and_follow import FnF
+from lab9.slr.slr import SLR, ParsingError
+
+# Bump when the format of the cache files or the way the parsing table is built changes.
+FORMAT_VERSION = 3
+
+__MAGIC = b'SLRT'
+# magic, version, symbols count, production rules count, names size, rules size, rows count, slots count
+__HEADER = struct.Struct('=4s7i')
+__SYMBOL_KINDS = {
+    Terminal: 0,
+    Nonterminal: 1,
+    Dollar: 2
+}
+
+
+class TableCacheError(RuntimeError):
+    """
+        Error thrown when a cache file can't be read or was written by another version.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(f'Bad cache file {path}.')
+
+
+def get_grammar_hash(grammar_path: str, builder: Type[SLR] = SLR, strict: bool = True) -> str:
+    """
+        Hash the content of a grammar file together with the cache format version, the parser builder and whether
+        the grammar was strictly checked, so a table built without the checks is never loaded by a strict caller.
+
+    Args:
+        grammar_path (str): Path to the CFG file
+        builder (Type[SLR], optional): the class which builds the parsing table. Defaults to SLR.
+        strict (bool, optional): the grammar is rejected if it is left recursive or non-deterministic. Defaults to
+        True.
+
+    Returns:
+        str: the hex digest
+    """
+
+    sha256 = hashlib.sha256(f'{FORMAT_VERSION}\n{builder.__name__}\n{strict}\n'.encode())
+    with open(grammar_path, 'rb') as fin:
+        sha256.update(fin.read())
+
+    return sha256.hexdigest()
+
+
+def save_slr(slr: SLR, path: str):
+    """
+        Write the grammar and the parsing table of a parser to a flat binary cache file of native ints:
+        the header, the kind of every symbol, the offsets of the symbol names in the names blob, the names blob
+        (utf-8, padded to a multiple of 4 bytes), the offsets of the production rules in the rules array, the rules
+        array (the lhs column followed by the rhs columns, -1 for epsilon) and the compressed parsing table: the
+        default action and the base of every row, then the check and the value of every slot.
+        The file is written under another name and then renamed, so a reader never sees a half written file.
+
+    Args:
+        slr (SLR): the parser
+        path (str): Path to the cache file
+    """
+
+    symbol_indexes = {symbol: index for index, symbol in enumerate(slr.symbols)}
+    kinds = array('i', [__SYMBOL_KINDS[type(symbol)] for symbol in slr.symbols])
+    names = bytearray()
+    name_offsets = array('i', [0])
+    for symbol in slr.symbols:
+        names += symbol.symbol.encode()
+        name_offsets.append(len(names))
+
+    names += bytes(-len(names) % 4)
+    rule_offsets = array('i', [0])
+    rules = array('i')
+    for production_rule in slr.grammar.production_rules:
+        rules.append(symbol_indexes[production_rule.lhs])
+        rules.extend(-1 if isinstance(symbol, Epsilon) else symbol_indexes[symbol] for symbol in production_rule.rhs)
+        rule_offsets.append(len(rules))
+
+    table = slr.parsing_table
+    header = __HEADER.pack(__MAGIC, FORMAT_VERSION, len(slr.symbols), len(slr.grammar.production_rules),
+                           len(names), len(rules), table.rows_count, len(table.checks))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as fout:
+            for part in (header, kinds, name_offsets, names, rule_offsets, rules,
+                         table.defaults, table.bases, table.checks, table.values):
+                fout.write(part)
+
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def load_slr(path: str) -> SLR:
+    """
+        Open a parser from a cache file. The file is memory mapped and the parsing table is used in place, so every
+        process which opens the same file shares one copy of the table. Only the symbols and the production rules
+        are read into objects. The mapping stays open as long as the parsing table of the parser is referenced, and
+        on Windows the file can't be replaced meanwhile. The mapping of a bad file is closed before raising, so the
+        file can be written again.
+
+    Args:
+        path (str): Path to the cache file
+
+    Raises:
+        TableCacheError: if the file is not a cache file of the current version
+
+    Returns:
+        SLR: a parser which can only parse, it has no FnF and no closures
+    """
+
+    mapping = None
+    # Every view of the mapping, they must be released before it can be closed
+    views = []
+    try:
+        with open(path, 'rb') as fin:
+            mapping = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer = memoryview(mapping)
+        views.append(buffer)
+        magic, version, symbols_count, production_rules_count, names_size, rules_size, rows_count, slots_count = \
+            __HEADER.unpack_from(buffer)
+        if magic != __MAGIC or version != FORMAT_VERSION:
+            raise TableCacheError(path)
+
+        offset = __HEADER.size
+
+        def __read_ints__(count: int) -> memoryview:
+            nonlocal offset
+            ints = buffer[offset:offset + 4 * count].cast('i')
+            views.append(ints)
+            offset += 4 * count
+            return ints
+
+        kinds = __read_ints__(symbols_count)
+        name_offsets = __read_ints__(symbols_count + 1)
+        names = bytes(buffer[offset:offset + names_size])
+        offset += names_size
+        rule_offsets = __read_ints__(production_rules_count + 1)
+        rules = __read_ints__(rules_size)
+        defaults = __read_ints__(rows_count)
+        bases = __read_ints__(rows_count)
+        checks = __read_ints__(slots_count)
+        values = __read_ints__(slots_count)
+        if offset != len(buffer) or any(base < 0 or base + symbols_count > slots_count for base in bases):
+            raise TableCacheError(path)
+
+        symbol_classes = {kind: symbol_class for symbol_class, kind in __SYMBOL_KINDS.items()}
+        symbols = [Dollar() if kinds[index] == __SYMBOL_KINDS[Dollar] else
+                   symbol_classes[kinds[index]](names[name_offsets[index]:name_offsets[index + 1]].decode())
+                   for index in range(symbols_count)]
+        epsilon = Epsilon()
+        production_rules = [
+            ProductionRule(symbols[rules[rule_offsets[index]]],
+                           [epsilon if rules[position] == -1 else symbols[rules[position]]
+                            for position in range(rule_offsets[index] + 1, rule_offsets[index + 1])])
+            for index in range(production_rules_count)]
+    except (OSError, struct.error, KeyError, IndexError, TypeError, ValueError, TableCacheError) as e:
+        for view in views:
+            view.release()
+
+        if mapping is not None:
+            mapping.close()
+
+        if isinstance(e, TableCacheError):
+            raise
+
+        raise TableCacheError(path) from e
+
+    grammar = Grammar([symbol for symbol in symbols if isinstance(symbol, Nonterminal)],
+                      [symbol for symbol in symbols if isinstance(symbol, Terminal)],
+                      production_rules)
+    return SLR.from_table(grammar, symbols,
+                          CompressedTable(rows_count, symbols_count, defaults, bases, checks, values))
+
+
+def load_or_build(grammar_path: str, cache_dir: str = None, builder: Type[SLR] = SLR, strict: bool = True) -> SLR:
+    """
+        Load the parser of a grammar file from the cache, or build it and add it to the cache.
+        The cache file is named after the hash of the grammar file, so an edited grammar is built again.
+
+    Args:
+        grammar_path (str): Path to the CFG file
+        cache_dir (str, optional): the cache directory. Defaults to .slr_cache next to the grammar file.
+        builder (Type[SLR], optional): the class which builds the parsing table (e.g. LALR). Defaults to SLR.
+        strict (bool, optional): reject left recursive and non-deterministic grammars, like the lab requires.
+        Ambiguous grammars resolved with precedence declarations need False. Defaults to True.
+
+    Raises:
+        RuntimeError: if the grammar is strictly checked and it is left recursive or non-deterministic
+
+    Returns:
+        SLR: the parser
+    """
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(grammar_path)), '.slr_cache')
+
+    cache_path = os.path.join(cache_dir, f'{get_grammar_hash(grammar_path, builder, strict)}.slr')
+    if os.path.exists(cache_path):
+        try:
+            return load_slr(cache_path)
+        except TableCacheError:
+            pass  # Build it again and overwrite the bad file.
+
+    grammar: Grammar = load_grammar(grammar_path)
+    if strict and not is_left_recursive(grammar):
+        raise RuntimeError('The given grammar is left recursive!')
+
+    if strict and not is_deterministic(grammar):
+        raise RuntimeError('The given grammar is non-deterministic!')
+
+    slr = builder(grammar, FnF(grammar))
+    save_slr(slr, cache_path)
+    return slr
+
+
+@pytest.mark.parametrize(
+    "grammar_content,sequences",
+    [
+        ('S->a S b|c\n', ['c', 'a c b', 'a c', 'b']),
+        ('S->a A\nA->b A|epsilon\n', ['a', 'a b b', 'b', 'a a'])
+    ]
+)
+def test__load_or_build__(grammar_content, sequences, tmp_path):
+    grammar_path = os.path.join(tmp_path, 'test.in')
+    with open(grammar_path, 'w') as fout:
+        fout.write(grammar_content)
+
+    built = load_or_build(grammar_path)
+    cache_files = os.listdir(os.path.join(tmp_path, '.slr_cache'))
+    assert cache_files == [f'{get_grammar_hash(grammar_path)}.slr']
+
+    loaded = load_or_build(grammar_path)
+    assert isinstance(loaded.parsing_table.values, memoryview)
+    assert loaded.parsing_table == built.parsing_table
+    assert loaded.grammar.production_rules == built.grammar.production_rules
+    for sequence in sequences:
+        buffer = [Terminal(symbol) for symbol in sequence.split(' ')]
+        try:
+            expected = built.parse(buffer, trace=True)
+        except ParsingError as e:
+            expected = str(e)
+
+        try:
+            result = loaded.parse(buffer, trace=True)
+        except ParsingError as e:
+            result = str(e)
+
+        assert result == expected
+
+
+def test__load_slr__bad_file__(tmp_path, monkeypatch):
+    grammar_path = os.path.join(tmp_path, 'test.in')
+    with open(grammar_path, 'w') as fout:
+        fout.write('S->a S b|c\n')
+
+    cache_path = os.path.join(tmp_path, '.slr_cache', f'{get_grammar_hash(grammar_path)}.slr')
+    built = load_or_build(grammar_path)
+    with open(cache_path, 'r+b') as fout:
+        fout.truncate(os.path.getsize(cache_path) - 4)
+
+    with pytest.raises(TableCacheError):
+        load_slr(cache_path)
+
+    # The mapping of a bad file is closed, Windows can't replace a mapped file
+    mappings = []
+
+    class __RecordedMmap__(mmap.mmap):
+        def __init__(self, *args, **kwargs):
+            super().__init__()
+            mappings.append(self)
+
+    monkeypatch.setattr(mmap, 'mmap', __RecordedMmap__)
+    for size in (os.path.getsize(cache_path) - 4, 40):
+        with open(cache_path, 'r+b') as fout:
+            fout.truncate(size)
+
+        with pytest.raises(TableCacheError):
+            load_slr(cache_path)
+
+    assert len(mappings) == 2 and all(mapping.closed for mapping in mappings)
+
+    # A bad cache file is built and written again.
+    assert load_or_build(grammar_path).parsing_table == built.parsing_table
+    assert load_slr(cache_path).parsing_table == built.parsing_table
+
+
+def test__load_or_build__builder__(tmp_path):
+    from lab9.slr.lalr import LALR
+    from lab9.slr.slr import ShiftReduceConflict
+
+    grammar_path = os.path.join(tmp_path, 'test.in')
+    with open(grammar_path, 'w') as fout:
+        fout.write('S->L = R|R\nL->* R|id\nR->L\n')
+
+    with pytest.raises(ShiftReduceConflict):
+        load_or_build(grammar_path)
+
+    built = load_or_build(grammar_path, builder=LALR)
+    assert os.path.exists(os.path.join(tmp_path, '.slr_cache', f'{get_grammar_hash(grammar_path, LALR)}.slr'))
+    loaded = load_or_build(grammar_path, builder=LALR)
+    assert loaded.parsing_table == built.parsing_table
+    buffer = [Terminal(symbol) for symbol in '* id = id'.split(' ')]
+    assert loaded.parse(buffer) == built.parse(buffer)
+
+
+def test__load_or_build__strict__(tmp_path):
+    grammar_path = os.path.join(tmp_path, 'test.in')
+    with open(grammar_path, 'w') as fout:
+        fout.write('%left +\nE->E + E|i\n')
+
+    built = load_or_build(grammar_path, strict=False)
+    # A table cached without the checks doesn't skip them
+    with pytest.raises(RuntimeError, match='left recursive'):
+        load_or_build(grammar_path)
+
+    assert load_or_build(grammar_path, strict=False).parsing_table == built.parsing_table
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
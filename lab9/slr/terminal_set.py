@@ -0,0 +1,143 @@
+from typing import List, Dict, Iterable, Iterator
+
+import pytest
+
+from lab9.grammar.symbols.dollar import Dollar
+from lab9.grammar.symbols.symbol import Symbol
+from lab9.grammar.symbols.terminal import Terminal
+
+
+class TerminalSet:
+    """
+    Class that represents an immutable set of terminals as an int bitset. The terminals are numbered by a shared
+    list, so unions, intersections and membership tests are int operations instead of hashing symbols.
+    """
+
+    __slots__ = ('__terminals', '__terminal_ids', '__bits')
+
+    def __init__(self, terminals: List[Symbol], terminal_ids: Dict[Symbol, int], bits: int = 0):
+        """
+        Args:
+            terminals (List[Symbol]): the terminal of every bit, shared by all the sets which are combined
+            terminal_ids (Dict[Symbol, int]): the bit of every terminal
+            bits (int, optional): the bitset. Defaults to 0.
+        """
+        self.__terminals = terminals
+        self.__terminal_ids = terminal_ids
+        self.__bits = bits
+
+    @staticmethod
+    def numbering(terminals: Iterable[Symbol]) -> 'TerminalSet':
+        """
+        Number the given terminals, in order.
+
+        Returns:
+            TerminalSet: the empty set over the numbering
+        """
+        terminals = list(dict.fromkeys(terminals))
+        return TerminalSet(terminals, {terminal: index for index, terminal in enumerate(terminals)})
+
+    # region Getters and Setters
+
+    @property
+    def bits(self) -> int:
+        return self.__bits
+
+    @property
+    def terminals(self) -> List[Symbol]:
+        return self.__terminals
+
+    # endregion
+
+    def from_bits(self, bits: int) -> 'TerminalSet':
+        return TerminalSet(self.__terminals, self.__terminal_ids, bits)
+
+    def from_symbols(self, symbols: Iterable[Symbol]) -> 'TerminalSet':
+        bits = 0
+        for symbol in symbols:
+            bits |= 1 << self.__terminal_ids[symbol]
+
+        return TerminalSet(self.__terminals, self.__terminal_ids, bits)
+
+    def get_id(self, terminal: Symbol) -> int:
+        return self.__terminal_ids.get(terminal, -1)
+
+    def contains_id(self, terminal_id: int) -> bool:
+        return (self.__bits >> terminal_id) & 1 == 1
+
+    def __contains__(self, terminal: Symbol) -> bool:
+        terminal_id = self.__terminal_ids.get(terminal)
+        return terminal_id is not None and (self.__bits >> terminal_id) & 1 == 1
+
+    def __iter__(self) -> Iterator[Symbol]:
+        bits = self.__bits
+        while bits:
+            low_bit = bits & -bits
+            yield self.__terminals[low_bit.bit_length() - 1]
+            bits ^= low_bit
+
+    def __len__(self):
+        return bin(self.__bits).count('1')
+
+    def __bool__(self):
+        return self.__bits != 0
+
+    def __or__(self, other: 'TerminalSet') -> 'TerminalSet':
+        return TerminalSet(self.__terminals, self.__terminal_ids, self.__bits | other.__bits)
+
+    def __and__(self, other: 'TerminalSet') -> 'TerminalSet':
+        return TerminalSet(self.__terminals, self.__terminal_ids, self.__bits & other.__bits)
+
+    def __sub__(self, other: 'TerminalSet') -> 'TerminalSet':
+        return TerminalSet(self.__terminals, self.__terminal_ids, self.__bits & ~other.__bits)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TerminalSet):
+            return self.__terminals is other.__terminals and self.__bits == other.__bits
+
+        if isinstance(other, (set, frozenset)):
+            return set(self) == other
+
+        return False
+
+    def __ne__(self, other) -> bool:
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.__bits)
+
+    def __repr__(self):
+        return f"{{{', '.join(repr(terminal) for terminal in self)}}}"
+
+    def __str__(self):
+        return repr(self)
+
+
+@pytest.mark.parametrize(
+    "a,b",
+    [
+        (['a', 'b'], ['b', 'c']),
+        ([], ['a']),
+        (['a', 'b', 'c', '$'], ['$'])
+    ]
+)
+def test__operations__(a, b):
+    def __to_symbols__(names: List[str]) -> List[Symbol]:
+        return [Dollar() if name == '$' else Terminal(name) for name in names]
+
+    empty = TerminalSet.numbering(__to_symbols__(['a', 'b', 'c', '$']))
+    a_set = empty.from_symbols(__to_symbols__(a))
+    b_set = empty.from_symbols(__to_symbols__(b))
+    a_symbols = set(__to_symbols__(a))
+    b_symbols = set(__to_symbols__(b))
+
+    assert a_set == a_symbols and len(a_set) == len(a_symbols)
+    assert (a_set | b_set) == a_symbols | b_symbols
+    assert (a_set & b_set) == a_symbols & b_symbols
+    assert (a_set - b_set) == a_symbols - b_symbols
+    assert bool(a_set & b_set) == bool(a_symbols & b_symbols)
+    assert all((symbol in a_set) == (symbol in a_symbols) for symbol in __to_symbols__(['a', 'b', 'c', '$', 'd']))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])